@@ -60,6 +60,7 @@ class Crossword():
         # Save vocabulary list
         with open(words_file) as f:
             self.words = set(f.read().upper().splitlines())
+        self.index = WordIndex(self.words)
 
         # Determine variable set
         self.variables = set()
@@ -131,3 +132,65 @@ class Crossword():
             v for v in self.variables
             if v != var and self.overlaps[v, var]
         )
+
+
+class WordIndex():
+
+    def __init__(self, words):
+        """
+        Index a vocabulary so that sets of words can be stored as bitsets.
+
+        Words are bucketed by length and numbered within their bucket, and
+        a set of words of one length is an int whose bit k is set if it
+        contains the kth word of that length. For each length, position
+        and letter, `letters` holds the set of words with that letter at
+        that position.
+        """
+        self.words = dict()
+        for word in sorted(words):
+            self.words.setdefault(len(word), []).append(word)
+        self.ids = {
+            word: k
+            for bucket in self.words.values()
+            for k, word in enumerate(bucket)
+        }
+
+        self.letters = dict()
+        for length, bucket in self.words.items():
+            self.letters[length] = [dict() for _ in range(length)]
+            for k, word in enumerate(bucket):
+                for position, letter in enumerate(word):
+                    table = self.letters[length][position]
+                    table[letter] = table.get(letter, 0) | (1 << k)
+
+    def domain(self, length):
+        """Return the set of all words of the given length."""
+        return (1 << len(self.words.get(length, []))) - 1
+
+    def encode(self, word):
+        """Return the set containing only `word`."""
+        return 1 << self.ids[word]
+
+    def decode(self, length, bits):
+        """Return the list of words of the given length in set `bits`."""
+        bucket = self.words.get(length, [])
+        result = []
+        while bits:
+            low = bits & -bits
+            result.append(bucket[low.bit_length() - 1])
+            bits ^= low
+        return result
+
+    def matching(self, length, position, letter):
+        """
+        Return the set of words of the given length with `letter` at
+        `position`.
+        """
+        if length not in self.letters:
+            return 0
+        return self.letters[length][position].get(letter, 0)
+
+
+def popcount(bits):
+    """Return the number of words in the set `bits`."""
+    return bin(bits).count("1")
@@ -1,19 +1,85 @@
+import heapq
 import sys
+from collections import deque
 
 from crossword import *
 
+# Rebuild the variable heap once it holds this many entries per variable
+HEAP_SLACK = 8
+
 
 class CrosswordCreator():
 
-    def __init__(self, crossword):
+    def __init__(self, crossword, inference="mac", ordering="degree"):
         """
         Create new CSP crossword generate.
+
+        Each domain is a bitset of words of the variable's length, as
+        numbered by `crossword.index` (see `WordIndex`). `inference` is
+        the inference run after each assignment while solving: "mac" to
+        maintain arc consistency, "forward" for forward checking only, or
+        None for plain backtracking. `ordering` picks the next variable to
+        assign during inference-enabled search: "degree" for fewest
+        remaining values, breaking ties by highest degree, or "wdeg" for
+        fewest remaining values per unit of conflict weight (dom/wdeg).
+        Raise ValueError for any other `inference` or `ordering`.
         """
+        if inference not in (None, "mac", "forward"):
+            raise ValueError(f"unknown inference {inference!r}")
+        if ordering not in ("degree", "wdeg"):
+            raise ValueError(f"unknown ordering {ordering!r}")
         self.crossword = crossword
+        self.index = crossword.index
         self.domains = {
-            var: self.crossword.words.copy()
+            var: self.index.domain(var.length)
+            for var in self.crossword.variables
+        }
+        self.neighbors = {
+            var: self.crossword.neighbors(var)
             for var in self.crossword.variables
         }
+
+        # For each arc (x, y) and letter, the number of the last word of
+        # `y` found to support the words of `x` with that letter
+        self.supports = {
+            (x, y): dict() for x in self.neighbors for y in self.neighbors[x]
+        }
+
+        # Other variables that could take the same word as each variable
+        self.same_length = {
+            var: [
+                v for v in self.crossword.variables
+                if v != var and v.length == var.length
+            ]
+            for var in self.crossword.variables
+        }
+
+        # Earlier domains of variables, undone when search backtracks
+        self.inference = inference
+        self.trail = []
+
+        # Variable ordering state: domain sizes, each constraint's weight
+        # (one plus its count of domain wipeouts), each variable's total
+        # weight over constraints with unassigned neighbors, the variables
+        # assigned so far, and a heap of (priority, variable) entries, some
+        # of which may be out of date
+        self.ordering = ordering
+        self.rank = {
+            var: k for k, var in enumerate(sorted(
+                self.crossword.variables,
+                key=lambda v: (v.i, v.j, v.direction)
+            ))
+        }
+        self.sizes = dict()
+        self.weights = {arc: 1 for arc in self.supports}
+        self.wdeg = {var: len(self.neighbors[var]) for var in self.neighbors}
+        self.assigned = set()
+        self.heap = []
+
+        # For each variable and position, the domain the letter counts in
+        # `counts` were computed for, and those counts
+        self.counts = dict()
+
     def letter_grid(self, assignment):
         """
         Return 2D array representing a given assignment.
@@ -89,8 +155,16 @@ class CrosswordCreator():
         Enforce node and arc consistency, and then solve the CSP.
         """
         self.enforce_node_consistency()
-        self.ac3()
-        return self.backtrack(dict())
+        if not self.ac3():
+            return None
+        if self.inference is None:
+            return self.backtrack(dict())
+        self.trail = []
+        self.assigned = set()
+        self.sizes = {var: popcount(self.domains[var]) for var in self.domains}
+        self.heap = [(self.priority(var), var) for var in self.domains]
+        heapq.heapify(self.heap)
+        return self.search(dict())
 
     def enforce_node_consistency(self):
         """
@@ -99,10 +173,7 @@ class CrosswordCreator():
          constraints; in this case, the length of the word.)
         """
         for var in self.domains:
-            d = self.domains[var].copy()
-            for word in d:
-                if len(word) != var.length:
-                    self.domains[var].remove(word)
+            self.domains[var] &= self.index.domain(var.length)
 
     def revise(self, x, y):
         """
@@ -112,22 +183,102 @@ class CrosswordCreator():
 
         Return True if a revision was made to the domain of `x`; return
         False if no revision was made.
-        
         """
-        revised = False
-        if self.crossword.overlaps[x,y] == None:
+        overlap = self.crossword.overlaps[x, y]
+        if overlap is None or not self.domains[x]:
             return False
-        d = self.domains[x].copy()
-        for w in d:
-            num = 0
-            for word in self.domains[y]:
-                
-                if w[self.crossword.overlaps[x,y][0]] != word[self.crossword.overlaps[x,y][1]]:
-                    num+=1
-            if num == len(self.domains[y]):
-                self.domains[x].remove(w)
-                revised = True
-        return revised
+
+        # Each letter of `x` at the overlap needs a word of `y` with the
+        # same letter there; the last one found is checked first
+        i, j = overlap
+        supports = self.supports[x, y]
+        domain = self.domains[x]
+        for letter, bits in self.index.letters[x.length][i].items():
+            if not domain & bits:
+                continue
+            last = supports.get(letter)
+            if last is not None and self.domains[y] >> last & 1:
+                continue
+            candidates = (
+                self.domains[y] & self.index.matching(y.length, j, letter)
+            )
+            if candidates:
+                supports[letter] = (candidates & -candidates).bit_length() - 1
+            else:
+                domain &= ~bits
+        return self.restrict(x, domain)
+
+    def restrict(self, var, domain):
+        """
+        Set the domain of `var` to `domain`, recording its old domain on
+        the trail so that `undo` can restore it. Return True if the domain
+        changed.
+        """
+        if domain == self.domains[var]:
+            return False
+        self.trail.append((var, self.domains[var]))
+        self.domains[var] = domain
+        self.resize(var)
+        return True
+
+    def undo(self, mark):
+        """
+        Restore the domains changed since the trail had `mark` entries.
+        """
+        while len(self.trail) > mark:
+            var, domain = self.trail.pop()
+            self.domains[var] = domain
+            self.resize(var)
+
+    def resize(self, var):
+        """
+        Record the new size of the domain of `var`, if search is tracking
+        sizes, and queue `var` under its new priority.
+        """
+        if self.sizes:
+            self.sizes[var] = popcount(self.domains[var])
+            heapq.heappush(self.heap, (self.priority(var), var))
+
+    def conflict(self, x, y):
+        """
+        Record that revising `x` against `y` emptied the domain of `x`,
+        increasing the weight of their constraint for dom/wdeg ordering.
+        """
+        self.weights[x, y] += 1
+        self.weights[y, x] += 1
+        for var, other in ((x, y), (y, x)):
+            if other not in self.assigned:
+                self.wdeg[var] += 1
+                self.requeue(var)
+
+    def claim(self, var):
+        """
+        Mark `var` as assigned, so its constraints no longer count towards
+        its neighbors' weights.
+        """
+        self.assigned.add(var)
+        for z in self.neighbors[var]:
+            self.wdeg[z] -= self.weights[z, var]
+            self.requeue(z)
+
+    def release(self, var):
+        """
+        Mark `var` as unassigned again, undoing `claim`.
+        """
+        self.assigned.discard(var)
+        for z in self.neighbors[var]:
+            self.wdeg[z] += self.weights[z, var]
+            self.requeue(z)
+
+    def requeue(self, var):
+        """
+        Queue an unassigned `var` under its new priority if search is
+        ordering variables by dom/wdeg.
+        """
+        if self.sizes and self.ordering == "wdeg":
+            if var not in self.assigned:
+                heapq.heappush(self.heap, (self.priority(var), var))
+
     def ac3(self, arcs=None):
         """
         Update `self.domains` such that each variable is arc consistent.
@@ -137,22 +288,25 @@ class CrosswordCreator():
         Return True if arc consistency is enforced and no domains are empty;
         return False if one or more domains end up empty.
         """
-        l = arcs
-        if l == None:
-            l = list()
-            for var in self.crossword.variables:
-                for v in self.crossword.variables:
-                    if var != v:
-                        l.append((var,v))
-        while len(l) != 0:
-            (x,y) = l.pop(0)
-            if self.revise(x,y):
-                if len(self.domains[x]) == 0:
+        if arcs is None:
+            arcs = list(self.supports)
+
+        # Arcs waiting to be revised, each queued at most once
+        queue = deque(arcs)
+        queued = set(queue)
+        while queue:
+            x, y = queue.popleft()
+            queued.discard((x, y))
+            if self.revise(x, y):
+                if not self.domains[x]:
+                    self.conflict(x, y)
                     return False
-                for z in self.crossword.neighbors(x):
-                    if z not in self.crossword.neighbors(y):
-                        l.append((z,x))
+                for z in self.neighbors[x]:
+                    if z != y and (z, x) not in queued:
+                        queue.append((z, x))
+                        queued.add((z, x))
         return True
+
     def assignment_complete(self, assignment):
         """
         Return True if `assignment` is complete (i.e., assigns a value to each
@@ -170,6 +324,8 @@ class CrosswordCreator():
         Return True if `assignment` is consistent (i.e., words fit in crossword
         puzzle without conflicting characters); return False otherwise.
         """
+        if len(set(assignment.values())) != len(assignment):
+            return False
         for x in assignment:
         
             if(len(assignment[x]) != x.length):
@@ -184,6 +340,56 @@ class CrosswordCreator():
                     
         return True
 
+    def consistent_value(self, assignment, var, word):
+        """
+        Return True if assigning `word` to `var` keeps the consistent
+        `assignment` consistent, checking only the constraints on `var`:
+        its length, its overlaps with assigned neighbors, and that no
+        other variable has the same word.
+        """
+        if len(word) != var.length:
+            return False
+        for v in self.neighbors[var]:
+            if v in assignment:
+                i, j = self.crossword.overlaps[var, v]
+                if word[i] != assignment[v][j]:
+                    return False
+        return all(
+            assignment.get(v) != word for v in self.same_length[var]
+        )
+
+    def infer(self, assignment, var, word):
+        """
+        Reduce the domain of `var` to `word` and remove `word` from the
+        domains of the other unassigned variables, then propagate those
+        changes to their neighbors: once for forward checking, or until
+        arc consistency is restored for "mac".
+
+        Return False if some domain became empty. Domain changes are
+        recorded on the trail.
+        """
+        self.restrict(var, self.index.encode(word))
+        changed = [var]
+        for v in self.same_length[var]:
+            if v not in assignment:
+                if self.restrict(v, self.domains[v] & ~self.domains[var]):
+                    if not self.domains[v]:
+                        return False
+                    changed.append(v)
+
+        arcs = [
+            (z, x) for x in changed for z in self.neighbors[x]
+            if z not in assignment
+        ]
+        if self.inference == "mac":
+            return self.ac3(arcs)
+        for z, x in arcs:
+            self.revise(z, x)
+            if not self.domains[z]:
+                self.conflict(z, x)
+                return False
+        return True
+
     def order_domain_values(self, var, assignment):
         """
         Return a list of values in the domain of `var`, in order by
@@ -191,20 +397,39 @@ class CrosswordCreator():
         The first value in the list, for example, should be the one
         that rules out the fewest values among the neighbors of `var`.
         """
-        mp = dict()
-        for word in self.domains[var]:
-            n = 0
-            for v in self.crossword.neighbors(var):
-                if v not in assignment:
-                    if self.crossword.overlaps[var,v] != None:
-                        for w in self.domains[v]:
-                            if word[self.crossword.overlaps[var,v][0]] != w[self.crossword.overlaps[var,v][1]]:
-                                n+=1
-            mp[word] = n
-        l = dict(sorted(mp.items(), key = lambda x:x[1]))
-        result = list(l)
-        return result
-        
+        # A word rules out the words of each unassigned neighbor that do
+        # not share its letter at their overlap
+        penalties = []
+        for v in self.neighbors[var]:
+            if v not in assignment:
+                i, j = self.crossword.overlaps[var, v]
+                counts = self.letter_counts(v, j)
+                size = popcount(self.domains[v])
+                penalties.append((i, counts, size))
+
+        words = self.index.decode(var.length, self.domains[var])
+        return sorted(words, key=lambda word: sum(
+            size - counts.get(word[i], 0) for i, counts, size in penalties
+        ))
+
+    def letter_counts(self, var, position):
+        """
+        Return a dictionary mapping each letter to the number of words in
+        the domain of `var` with that letter at `position`, reusing the
+        last counts made for that position unless the domain has changed.
+        """
+        domain, counts = self.counts.get((var, position), (None, None))
+        if domain != self.domains[var]:
+            domain = self.domains[var]
+            counts = dict()
+            if domain:
+                table = self.index.letters[var.length][position]
+                for letter, bits in table.items():
+                    if domain & bits:
+                        counts[letter] = popcount(domain & bits)
+            self.counts[var, position] = domain, counts
+        return counts
+
 
     def select_unassigned_variable(self, assignment):
         """
@@ -214,20 +439,42 @@ class CrosswordCreator():
         degree. If there is a tie, any of the tied variables are acceptable
         return values.
         """
-        mp = dict()
-        mb = dict()
-        for var in self.crossword.variables:
-            if var not in assignment:
-                mp[var] = len(self.domains[var])
-                mb[var] = len(self.crossword.neighbors(var))
-        l = dict(sorted(mp.items(), key = lambda x:x[1]))
-        m = dict(sorted(mp.items(),key = lambda x:x[1], reverse=True))
-        least_remaining = l[list(l.keys())[0]]
-        for v in m:
-            if l[v] == least_remaining:
-                return v
-        
-       
+        return min(
+            (var for var in self.crossword.variables if var not in assignment),
+            key=lambda var: (
+                popcount(self.domains[var]), -len(self.neighbors[var]),
+                self.rank[var]
+            )
+        )
+
+    def priority(self, var):
+        """
+        Return the heap priority of `var` under `self.ordering`, using
+        the tracked domain sizes; lower priorities are assigned first.
+        """
+        if self.ordering == "wdeg":
+            remaining = self.sizes[var] / max(1, self.wdeg[var])
+        else:
+            remaining = self.sizes[var]
+        return remaining, -len(self.neighbors[var]), self.rank[var]
+
+    def next_variable(self, assignment):
+        """
+        Pop and return the unassigned variable with the lowest priority.
+        Entries for assigned variables, or whose priority has changed
+        since they were pushed, are discarded along the way.
+        """
+        if len(self.heap) > HEAP_SLACK * len(self.domains):
+            self.heap = [
+                (self.priority(var), var) for var in self.domains
+                if var not in assignment
+            ]
+            heapq.heapify(self.heap)
+        while True:
+            priority, var = heapq.heappop(self.heap)
+            if var not in assignment and priority == self.priority(var):
+                return var
+
     def backtrack(self, assignment):
         """
         Using Backtracking Search, take as input a partial assignment for the
@@ -241,14 +488,40 @@ class CrosswordCreator():
         if self.assignment_complete(assignment):
             return assignment
         x = self.select_unassigned_variable(assignment)
-        for val in self.order_domain_values(x,assignment):
-            new = assignment.copy()
-            new[x] = val
-            
-            if self.consistent(new):
-                result = self.backtrack(new)
-                if result != None:
+        for val in self.order_domain_values(x, assignment):
+            if self.consistent_value(assignment, x, val):
+                assignment[x] = val
+                result = self.backtrack(assignment)
+                if result is not None:
+                    return result
+                del assignment[x]
+        return None
+
+    def search(self, assignment):
+        """
+        Like `backtrack`, but after each assignment run `self.inference`
+        to prune the domains of the remaining variables, undoing the
+        pruning from the trail when the assignment is retracted.
+        """
+        if self.assignment_complete(assignment):
+            return assignment
+        x = self.next_variable(assignment)
+        self.claim(x)
+        for val in self.order_domain_values(x, assignment):
+            if not self.consistent_value(assignment, x, val):
+                continue
+            mark = len(self.trail)
+            assignment[x] = val
+            if self.infer(assignment, x, val):
+                result = self.search(assignment)
+                if result is not None:
                     return result
+            del assignment[x]
+            self.undo(mark)
+
+        # Give the variable back to the heap for another branch
+        self.release(x)
+        heapq.heappush(self.heap, (self.priority(x), x))
         return None
 
 
@@ -0,0 +1,165 @@
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from heredity import METHODS, MODEL, load_data
+from model import Model
+
+# Number of families handed to a worker process at a time
+CHUNKSIZE = 8
+
+
+def main():
+
+    # Check for proper usage
+    if len(sys.argv) not in [3, 4, 5, 6]:
+        sys.exit("Usage: python batch.py (directory | manifest) "
+                 "output.(csv | json) [method] [processes] [model.json]")
+    families = list_families(sys.argv[1])
+    output = sys.argv[2]
+    method = sys.argv[3] if len(sys.argv) >= 4 else "exact"
+    processes = int(sys.argv[4]) if len(sys.argv) >= 5 else None
+    model = Model.load(sys.argv[5]) if len(sys.argv) == 6 else MODEL
+    if method not in METHODS:
+        sys.exit(f"Method must be one of: {', '.join(METHODS)}")
+    if os.path.splitext(output)[1] not in [".csv", ".json"]:
+        sys.exit("Output must be a .csv or .json file")
+
+    # Run inference for every family and write the results
+    start = time.perf_counter()
+    results = infer_families(families, method, model, processes)
+    failed = write_results(results, output)
+    elapsed = time.perf_counter() - start
+    print(f"{len(families)} families in {elapsed:.2f}s, {failed} failed")
+
+
+def list_families(source):
+    """
+    Return the family CSV files to process: every .csv file in `source`
+    if it is a directory, otherwise every non-blank line of the manifest
+    file `source`, taken relative to the manifest's directory.
+    """
+    if os.path.isdir(source):
+        return sorted(
+            os.path.join(source, filename)
+            for filename in os.listdir(source)
+            if filename.endswith(".csv")
+        )
+    directory = os.path.dirname(source)
+    with open(source) as f:
+        return [
+            os.path.join(directory, line.strip())
+            for line in f
+            if line.strip()
+        ]
+
+
+def infer_families(families, method="exact", model=MODEL, processes=None,
+                   chunksize=CHUNKSIZE):
+    """
+    Lazily yield an (family, seconds, probabilities, error) tuple for each
+    file in `families`, in order, computing probabilities with `method`
+    under `model` in a pool of `processes` worker processes (default: one
+    per CPU).
+
+    `seconds` is the time taken to load and solve that family. If it
+    could not be processed, `probabilities` is None and `error` describes
+    why; otherwise `error` is None.
+    """
+    with multiprocessing.Pool(
+        processes, initializer=_init_worker, initargs=(method, model)
+    ) as pool:
+        yield from pool.imap(_infer_family, families, chunksize)
+
+
+def _init_worker(method, model):
+    """
+    Set up a worker with the inference method and model to use for every
+    family it is given.
+    """
+    global _method, _model
+    _method = METHODS[method]
+    _model = model
+
+
+def _infer_family(family):
+    """
+    Load the family CSV `family` and compute its probabilities. Return a
+    result tuple as described in `infer_families`.
+    """
+    start = time.perf_counter()
+    try:
+        probabilities = _method(load_data(family), _model)
+    except Exception as e:
+        return family, time.perf_counter() - start, None, repr(e)
+    return family, time.perf_counter() - start, probabilities, None
+
+
+def write_results(results, output):
+    """
+    Write each family's probabilities and timing from `results` to the
+    file `output`, as CSV (one row per person) or JSON (one object per
+    family) depending on its extension. A failed family is written with
+    its error, as a single CSV row with no person or probabilities.
+    Report failed families on stderr and return how many there were.
+    """
+    failed = 0
+    with open(output, "w", newline="") as f:
+        if output.endswith(".json"):
+            families = dict()
+            for family, seconds, probabilities, error in results:
+                families[family] = {"seconds": seconds}
+                if error is not None:
+                    families[family]["error"] = error
+                else:
+                    families[family]["people"] = {
+                        person: {
+                            "gene": {
+                                str(g): p for g, p in fields["gene"].items()
+                            },
+                            "trait": {
+                                str(t).lower(): p
+                                for t, p in fields["trait"].items()
+                            }
+                        }
+                        for person, fields in probabilities.items()
+                    }
+                failed += error is not None
+                report(family, error)
+            json.dump(families, f, indent=2)
+        else:
+            writer = csv.writer(f)
+            writer.writerow([
+                "family", "seconds", "person", "gene_2", "gene_1", "gene_0",
+                "trait_true", "trait_false", "error"
+            ])
+            for family, seconds, probabilities, error in results:
+                if error is not None:
+                    failed += 1
+                    report(family, error)
+                    writer.writerow(
+                        [family, f"{seconds:.6f}"] + [""] * 6 + [error]
+                    )
+                    continue
+                for person, fields in probabilities.items():
+                    writer.writerow([
+                        family, f"{seconds:.6f}", person,
+                        *(fields["gene"][g] for g in (2, 1, 0)),
+                        fields["trait"][True], fields["trait"][False], ""
+                    ])
+    return failed
+
+
+def report(family, error):
+    """
+    Print `error` to stderr if the family could not be processed.
+    """
+    if error is not None:
+        print(f"{family}: {error}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import csv
+import math
+import sys
+import time
+
+import numpy as np
+
+from heredity import METHODS, MODEL, topological_order
+from network import JunctionTree
+
+SIZES = [4, 6, 8, 10, 20, 100, 1000]
+LOOPS = [0, 2]
+OBSERVED = 0.5
+MARRIAGE_RATE = 0.5
+ENUMERATE_LIMIT = 10 ** 5
+VECTORIZED_LIMIT = 10 ** 7
+EXACT_LIMIT = 10 ** 4
+
+
+def main():
+    if len(sys.argv) == 6 and sys.argv[1] == "generate":
+        size, loops = int(sys.argv[2]), int(sys.argv[3])
+        observed = float(sys.argv[4])
+        write_pedigree(random_pedigree(size, loops, observed), sys.argv[5])
+    elif len(sys.argv) > 1 and sys.argv[1] != "suite":
+        sys.exit("Usage: python benchmark.py "
+                 "[suite | generate size loops observed output.csv]")
+    else:
+        benchmark_suite(SIZES, LOOPS, OBSERVED)
+
+
+def benchmark_suite(sizes, loops, observed):
+    """
+    For random pedigrees of each size in `sizes` with each number of
+    `loops`, report every inference method's time and its largest error
+    in any gene or trait probability against exhaustive enumeration,
+    skipping methods that would take too long on that pedigree.
+    """
+    for size in sizes:
+        for count in loops:
+            people = random_pedigree(size, count, observed)
+            combinations = combination_count(people)
+            print(f"{len(people)} people, {count} loops, "
+                  f"10^{math.log10(combinations):.1f} combinations")
+
+            reference = None
+            if feasible("vectorized", people):
+                reference = METHODS["vectorized"](people, MODEL)
+
+            print(f"  {'method':<12}{'time':>10}{'max error':>12}")
+            for method, infer in METHODS.items():
+                if not feasible(method, people):
+                    continue
+                elapsed, probabilities = timed(infer, people, MODEL)
+                error = (
+                    f"{max_error(probabilities, reference):.2e}"
+                    if reference is not None else "-"
+                )
+                print(f"  {method:<12}{elapsed:>9.3f}s{error:>12}")
+
+
+def feasible(method, people):
+    """
+    Return True if `method` is expected to finish quickly on `people`:
+    enumeration is limited by the number of combinations and the junction
+    tree by the size of its largest clique table.
+    """
+    if method == "enumerate":
+        return combination_count(people) <= ENUMERATE_LIMIT
+    if method == "vectorized":
+        return combination_count(people) <= VECTORIZED_LIMIT
+    if method == "exact":
+        return 3 ** largest_clique(people) <= EXACT_LIMIT
+    return True
+
+
+def combination_count(people):
+    """
+    Return the number of gene and trait combinations enumerated for
+    `people` before pruning: 3 for each person with a known trait and 6
+    for each person without.
+    """
+    return math.prod(
+        3 if people[person]["trait"] is not None else 6 for person in people
+    )
+
+
+def largest_clique(people):
+    """
+    Return the number of people in the largest clique of the junction tree
+    for `people`.
+    """
+    tree = JunctionTree(people, MODEL.gene, MODEL.trait, MODEL.inheritance)
+    return max(len(clique) for clique in tree.cliques.values())
+
+
+def max_error(probabilities, reference):
+    """
+    Return the largest absolute difference between any gene or trait
+    probability in `probabilities` and in `reference`.
+    """
+    return max(
+        abs(probabilities[person][field][value]
+            - reference[person][field][value])
+        for person in reference
+        for field in reference[person]
+        for value in reference[person][field]
+    )
+
+
+def timed(function, *args):
+    """
+    Call `function` with `args`, and return the elapsed wall time in
+    seconds together with its result.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def random_pedigree(size, loops=0, observed=OBSERVED, model=MODEL, seed=0):
+    """
+    Return a random multi-generation family of `size` people in the format
+    returned by `load_data`.
+
+    The family grows from one couple: each new person is a child of a
+    random existing couple, and some children marry someone from outside
+    the family, forming a new couple. The last `loops` people are instead
+    children of two relatives, closing a loop in the family tree. Genes
+    and traits are drawn from `model`, and each person's trait is known
+    with probability `observed`.
+    """
+    rng = np.random.default_rng(seed)
+    names = ["Person0", "Person1"]
+    parents = [None, None]
+    couples = [(0, 1)]
+    descendants = []
+
+    while len(names) < size:
+        if len(names) >= size - loops and len(descendants) >= 2:
+            mother, father = rng.choice(descendants, 2, replace=False)
+        else:
+            mother, father = couples[rng.integers(len(couples))]
+        child = len(names)
+        names.append(f"Person{child}")
+        parents.append((mother, father))
+        descendants.append(child)
+
+        # Marry someone from outside the family, if there is room
+        if len(names) < size - loops and rng.random() < MARRIAGE_RATE:
+            spouse = len(names)
+            names.append(f"Person{spouse}")
+            parents.append(None)
+            if rng.random() < 0.5:
+                couples.append((child, spouse))
+            else:
+                couples.append((spouse, child))
+
+    # Draw everyone's genes, parents first, and their traits
+    genes = []
+    for person in range(len(names)):
+        if parents[person] is None:
+            distribution = model.gene
+        else:
+            mother, father = parents[person]
+            distribution = model.inheritance[genes[mother], genes[father]]
+        genes.append(rng.choice(3, p=distribution))
+
+    people = dict()
+    for person, name in enumerate(names):
+        trait = bool(rng.random() < model.trait[genes[person], 1])
+        mother, father = parents[person] or (None, None)
+        people[name] = {
+            "name": name,
+            "mother": None if mother is None else names[mother],
+            "father": None if father is None else names[father],
+            "trait": trait if rng.random() < observed else None
+        }
+    return people
+
+
+def write_pedigree(people, filename):
+    """
+    Write `people` to `filename` as a CSV file in the format read by
+    `load_data`, with everyone's parents listed before them.
+    """
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "mother", "father", "trait"])
+        for person in topological_order(people):
+            trait = people[person]["trait"]
+            writer.writerow([
+                person,
+                people[person]["mother"] or "",
+                people[person]["father"] or "",
+                "" if trait is None else int(trait)
+            ])
+
+
+if __name__ == "__main__":
+    main()
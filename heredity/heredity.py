@@ -1,7 +1,14 @@
 import csv
 import itertools
+import math
 import sys
 
+import numpy as np
+
+from model import Model
+from network import JunctionTree
+from sampling import Pedigree, gibbs_sampling, likelihood_weighting
+
 PROBS = {
 
     # Unconditional probabilities for having gene
@@ -36,66 +43,215 @@ PROBS = {
     "mutation": 0.01
 }
 
+# Model used unless another is loaded, compiled once at startup
+MODEL = Model(PROBS)
+
+# Number of gene and trait combinations to evaluate at once
+BATCH = 1 << 16
+
+# Sampling budget for approximate inference
+SAMPLES = 100000
+CHAINS = 100
+BURN_IN = 100
+
 
 def main():
 
     # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
+    if len(sys.argv) not in [2, 3, 4]:
+        sys.exit("Usage: python heredity.py data.csv [method] [model.json]")
     people = load_data(sys.argv[1])
+    method = sys.argv[2] if len(sys.argv) >= 3 else "exact"
+    if method not in METHODS:
+        sys.exit(f"Method must be one of: {', '.join(METHODS)}")
+    model = Model.load(sys.argv[3]) if len(sys.argv) == 4 else MODEL
+
+    # Compute gene and trait probabilities for each person
+    probabilities = METHODS[method](people, model)
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                print(f"    {value}: {p:.4f}")
 
-    # Keep track of gene and trait probabilities for each person
+
+def enumerate_probabilities(people, model=MODEL):
+    """
+    Compute gene and trait probabilities for each person by enumerating
+    every combination of gene counts and traits in the family, under the
+    probability `model` (see `model.Model`).
+    """
+
+    # Keep track of the log of each gene and trait probability for each
+    # person, starting from log(0)
     probabilities = {
         person: {
             "gene": {
-                2: 0,
-                1: 0,
-                0: 0
+                2: -math.inf,
+                1: -math.inf,
+                0: -math.inf
             },
             "trait": {
-                True: 0,
-                False: 0
+                True: -math.inf,
+                False: -math.inf
             }
         }
         for person in people
     }
-   
-    
-
-    # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
-
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
+
+    # Loop over every combination consistent with known information
+    for one_gene, two_genes, have_trait, log_p in assignments(people, model):
+
+        # Update probabilities with new joint probability
+        log_update(probabilities, one_gene, two_genes, have_trait, log_p)
+
+    # Ensure probabilities sum to 1
+    log_normalize(probabilities)
+    return probabilities
+
+
+def vectorized_probabilities(people, model=MODEL, batch=BATCH):
+    """
+    Compute gene and trait probabilities for each person by enumerating
+    every combination of gene counts and traits consistent with the known
+    traits, evaluating `batch` combinations at a time with NumPy.
+
+    Raise ValueError if there are too many combinations to number with
+    64-bit integers, or if the known traits are impossible under the model.
+    """
+    names = list(people)
+    index = {person: i for i, person in enumerate(names)}
+    n = len(names)
+    observed = np.array([people[p]["trait"] is not None for p in names])
+    known = np.array([bool(people[p]["trait"]) for p in names], dtype=int)
+    founders = [i for i, p in enumerate(names) if people[p]["mother"] is None]
+    children = [i for i, p in enumerate(names) if people[p]["mother"]]
+    mothers = [index[people[names[i]]["mother"]] for i in children]
+    fathers = [index[people[names[i]]["father"]] for i in children]
+
+    log_gene = np.array(model.log_gene)
+    log_trait = np.array(model.log_trait)
+    log_inheritance = np.array(model.log_inheritance)
+
+    # Each combination is a number whose digits give each person's state:
+    # a gene count if their trait is known, else a gene count and a trait
+    radix = np.where(observed, 3, 6)
+    total = math.prod(radix.tolist())
+    if total > np.iinfo(np.int64).max:
+        raise ValueError("too many combinations to enumerate")
+    place = np.concatenate([[1], np.cumprod(radix)[:-1]])
+
+    # Marginals are accumulated into one flat array of per-person bins
+    gene_bins = np.arange(n) * 3
+    trait_bins = np.arange(n) * 2
+    gene_sums = np.zeros(3 * n)
+    trait_sums = np.zeros(2 * n)
+    shift = -np.inf
+    for start in range(0, total, batch):
+        codes = np.arange(start, min(start + batch, total))
+        states = codes[:, np.newaxis] // place % radix
+        genes = np.where(observed, states, states // 2)
+        traits = np.where(observed, known, states % 2)
+
+        # Log joint probability of every combination in the batch
+        log_p = log_trait[genes, traits].sum(axis=1)
+        log_p += log_gene[genes[:, founders]].sum(axis=1)
+        log_p += log_inheritance[
+            genes[:, mothers], genes[:, fathers], genes[:, children]
+        ].sum(axis=1)
+
+        # Sums are kept relative to the largest log probability seen so
+        # far, so that they do not underflow in large families
+        if log_p.max() > shift:
+            gene_sums *= np.exp(shift - log_p.max())
+            trait_sums *= np.exp(shift - log_p.max())
+            shift = log_p.max()
+        if shift == -np.inf:
             continue
+        p = np.exp(log_p - shift)
 
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
+        # Add each combination's probability to every person's marginals
+        weights = np.repeat(p, n)
+        gene_sums += np.bincount(
+            (genes + gene_bins).ravel(), weights, minlength=3 * n
+        )
+        trait_sums += np.bincount(
+            (traits + trait_bins).ravel(), weights, minlength=2 * n
+        )
 
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+    if shift == -np.inf:
+        raise ValueError("known traits are impossible under the model")
+    gene_sums = gene_sums.reshape(n, 3)
+    trait_sums = trait_sums.reshape(n, 2)
+    gene_sums /= gene_sums.sum(axis=1, keepdims=True)
+    trait_sums /= trait_sums.sum(axis=1, keepdims=True)
+    return distributions(names, gene_sums, trait_sums)
 
-   # Ensure probabilities sum to 1
-    normalize(probabilities)
 
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+def sample_probabilities(people, model=MODEL, method="gibbs",
+                         samples=SAMPLES, time_budget=None, seed=None,
+                         chains=CHAINS, burn_in=BURN_IN):
+    """
+    Estimate gene and trait probabilities for each person by sampling,
+    for families too large or too interrelated for exact inference.
+
+    `method` is "likelihood" for likelihood weighting or "gibbs" for
+    `chains` Gibbs samplers run side by side, each discarding its first
+    `burn_in` sweeps (see `sampling`). Sampling stops after `samples`
+    samples or once `time_budget` seconds have passed. Return the
+    estimated probabilities, and the standard error of each estimate in
+    the same format.
+    """
+    order = topological_order(people)
+    pedigree = Pedigree(people, order)
+    tables = (model.gene, model.trait, model.inheritance)
+    if method == "likelihood":
+        gene, trait, gene_error, trait_error = likelihood_weighting(
+            pedigree, *tables, samples, time_budget, seed
+        )
+    elif method == "gibbs":
+        gene, trait, gene_error, trait_error = gibbs_sampling(
+            pedigree, *tables, samples, chains, burn_in, time_budget, seed
+        )
+    else:
+        raise ValueError(f"unknown sampling method {method!r}")
+    return (
+        distributions(order, gene, trait),
+        distributions(order, gene_error, trait_error)
+    )
+
+
+def distributions(names, gene, trait):
+    """
+    Return gene and trait distributions in the format used by `main`,
+    given arrays whose rows follow `names` and whose columns are indexed
+    by gene count and by trait value (0 or 1) respectively.
+    """
+    return {
+        person: {
+            "gene": {g: float(gene[i, g]) for g in (2, 1, 0)},
+            "trait": {True: float(trait[i, 1]), False: float(trait[i, 0])}
+        }
+        for i, person in enumerate(names)
+    }
+
+
+def eliminate_probabilities(people, model=MODEL):
+    """
+    Compute gene and trait probabilities for each person exactly, by
+    passing messages in a junction tree built from the family (see
+    `network.JunctionTree`). This takes time polynomial in the size of
+    the family when it has few marriages between relatives.
+    """
+    tree = JunctionTree(people, model.gene, model.trait, model.inheritance)
+    tree.calibrate()
+    return tree.marginals()
+
 
-    
 def load_data(filename):
     """
     Load gene and trait data from a file into a dictionary.
@@ -118,6 +274,104 @@ def load_data(filename):
     return data
 
 
+def assignments(people, model=MODEL):
+    """
+    Lazily yield every (one_gene, two_genes, have_trait, log_p) tuple of
+    sets that agrees with the known traits in `people` and has nonzero
+    probability, along with the log of its joint probability.
+
+    Known traits are fixed rather than enumerated, so only people with
+    unknown traits double the number of combinations. Gene counts are
+    chosen parents first, skipping any count that is impossible given the
+    parents' counts or the person's known trait, along with every
+    combination that would extend it. The log probability of everyone
+    chosen so far is carried down with each choice, so the factors of
+    shared ancestors are computed once for all their descendants'
+    combinations. Combinations are built as bitmasks and only turned into
+    sets as they are yielded.
+    """
+    names = list(people)
+    bit = {person: 1 << i for i, person in enumerate(names)}
+    order = topological_order(people)
+    log_gene = model.log_gene
+    log_trait = model.log_trait
+    log_inheritance = model.log_inheritance
+
+    def members(mask):
+        return {person for person in names if mask & bit[person]}
+
+    def gene_masks(depth, one, two, genes, log_p):
+        if depth == len(order):
+            yield one, two, log_p
+            return
+        person = order[depth]
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+        trait = people[person]["trait"]
+        if mother is None:
+            factors = log_gene
+        else:
+            factors = log_inheritance[genes[mother]][genes[father]]
+        for gene in range(3):
+            factor = factors[gene]
+            if trait is not None:
+                factor += log_trait[gene][trait]
+            if factor == -math.inf:
+                continue
+            genes[person] = gene
+            yield from gene_masks(
+                depth + 1,
+                one | bit[person] if gene == 1 else one,
+                two | bit[person] if gene == 2 else two,
+                genes,
+                log_p + factor
+            )
+
+    known = sum(bit[person] for person in names if people[person]["trait"])
+    unknown = [p for p in names if people[p]["trait"] is None]
+    for one, two, log_p in gene_masks(0, 0, 0, dict(), 0):
+        one_gene = members(one)
+        two_genes = members(two)
+
+        # Each unknown trait contributes its own factor given the gene
+        factors = [
+            log_trait[2 if bit[p] & two else 1 if bit[p] & one else 0]
+            for p in unknown
+        ]
+        for choice in range(1 << len(unknown)):
+            have_trait = known
+            log_q = log_p
+            for i, person in enumerate(unknown):
+                trait = choice >> i & 1
+                if trait:
+                    have_trait |= bit[person]
+                log_q += factors[i][trait]
+            if log_q > -math.inf:
+                yield one_gene, two_genes, members(have_trait), log_q
+
+
+def topological_order(people):
+    """
+    Return a list of the names in `people` in which everyone's parents
+    come before them.
+    """
+    order = []
+    placed = set()
+
+    def place(person):
+        if person in placed:
+            return
+        placed.add(person)
+        for parent in (people[person]["mother"], people[person]["father"]):
+            if parent is not None:
+                place(parent)
+        order.append(person)
+
+    for person in people:
+        place(person)
+    return order
+
+
 def powerset(s):
     """
     Return a list of all possible subsets of set s.
@@ -130,7 +384,8 @@ def powerset(s):
     ]
 
 
-def joint_probability(people, one_gene, two_genes, have_trait):
+def joint_probability(people, one_gene, two_genes, have_trait,
+                      model=MODEL):
     """
     Compute and return a joint probability.
 
@@ -141,60 +396,35 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         * everyone in set `have_trait` has the trait, and
         * everyone not in set` have_trait` does not have the trait.
     """
-    prob = 1
-    parents = dict()
-    for person in people.keys():
-        if people[person]['mother'] == None:
-            if person in one_gene:
-                prob*=PROBS['gene'][1]
-                if person in have_trait:
-                    prob*=PROBS["trait"][1][True]
-                else:
-                    prob*=PROBS['trait'][1][False]
-                parents[person] = 0.5
-            elif person in two_genes:
-                prob*=PROBS['gene'][2]
-                if person in have_trait:
-                    prob*=PROBS["trait"][2][True]
-                else:
-                    prob*=PROBS['trait'][2][False]
-                parents[person] = 1 - PROBS["mutation"]
-            else:
-                prob*=PROBS['gene'][0]
-                if person in have_trait:
-                    prob*=PROBS["trait"][0][True]
-                else:
-                    prob*=PROBS['trait'][0][False]
-                parents[person] = PROBS["mutation"]
-           
-    for person in people.keys():
-        if people[person]['mother'] != None:
-            if person in one_gene:
-                m = people[person]['mother']
-                f = people[person]['father']
-                prob*=parents[m]*(1-parents[f]) + parents[f]*(1-parents[m])
-                if person in have_trait:
-                    prob*=PROBS["trait"][1][True]
-                else:
-                    prob*=PROBS["trait"][1][False]
-            elif person in two_genes:
-                m = people[person]['mother']
-                f = people[person]['father']
-                prob*=parents[m]*parents[f]
-                if person in have_trait:
-                    prob*=PROBS["trait"][2][True]
-                else:
-                    prob*=PROBS["trait"][2][False]
-            else:
-                m = people[person]['mother']
-                f = people[person]['father']
-                prob*=(1-parents[m]) * (1-parents[f])
-                if person in have_trait:
-                    prob*=PROBS["trait"][0][True]
-                else:
-                    prob*=PROBS["trait"][0][False]
-    return prob
-    
+    return math.exp(
+        log_joint_probability(people, one_gene, two_genes, have_trait, model)
+    )
+
+
+def log_joint_probability(people, one_gene, two_genes, have_trait,
+                          model=MODEL):
+    """
+    Return the natural log of `joint_probability`, or -inf if it is zero.
+    Summing logs rather than multiplying probabilities keeps the result
+    meaningful for families large enough that the product underflows.
+    """
+    genes = {
+        person: 1 if person in one_gene else 2 if person in two_genes else 0
+        for person in people
+    }
+    log_p = 0
+    for person in people:
+        gene = genes[person]
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+        if mother is None:
+            log_p += model.log_gene[gene]
+        else:
+            log_p += model.log_inheritance[genes[mother]][genes[father]][gene]
+        log_p += model.log_trait[gene][person in have_trait]
+    return log_p
+
+
 def update(probabilities, one_gene, two_genes, have_trait, p):
     """
     Add to `probabilities` a new joint probability `p`.
@@ -202,45 +432,88 @@ def update(probabilities, one_gene, two_genes, have_trait, p):
     Which value for each distribution is updated depends on whether
     the person is in `have_gene` and `have_trait`, respectively.
     """
-    for person in probabilities.keys():
-        if person in one_gene:
-            probabilities[person]["gene"][1] += p
-            if person in have_trait:
-                probabilities[person]["trait"][True] += p
-            else:
-                probabilities[person]["trait"][False] += p
-        elif person in two_genes:
-            probabilities[person]["gene"][2] += p
-            if person in have_trait:
-                probabilities[person]["trait"][True] += p
-            else:
-                probabilities[person]["trait"][False] += p
-        else:
-            probabilities[person]["gene"][0] += p
-            if person in have_trait:
-                probabilities[person]["trait"][True] += p
-            else:
-                probabilities[person]["trait"][False] += p
-        
+    for person in probabilities:
+        gene = 1 if person in one_gene else 2 if person in two_genes else 0
+        probabilities[person]["gene"][gene] += p
+        probabilities[person]["trait"][person in have_trait] += p
+
+
+def log_update(probabilities, one_gene, two_genes, have_trait, log_p):
+    """
+    Like `update`, but for `probabilities` holding the logs of the sums,
+    adding a new joint probability whose log is `log_p`.
+    """
+    for person in probabilities:
+        gene = 1 if person in one_gene else 2 if person in two_genes else 0
+        distribution = probabilities[person]["gene"]
+        distribution[gene] = log_add(distribution[gene], log_p)
+        distribution = probabilities[person]["trait"]
+        trait = person in have_trait
+        distribution[trait] = log_add(distribution[trait], log_p)
+
 
 def normalize(probabilities):
     """
     Update `probabilities` such that each probability distribution
     is normalized (i.e., sums to 1, with relative proportions the same).
+
+    Raise ValueError if a distribution sums to zero, which means the
+    known traits are impossible under the model.
+    """
+    for person in probabilities:
+        for field in ("gene", "trait"):
+            distribution = probabilities[person][field]
+            total = sum(distribution.values())
+            if total == 0:
+                raise ValueError(f"{person} has no possible {field} value")
+            for value in distribution:
+                distribution[value] /= total
+
+
+def log_normalize(probabilities):
+    """
+    Like `normalize`, but for `probabilities` holding logs of unnormalized
+    probabilities: replace them with normalized probabilities, computed
+    with log-sum-exp so that tiny values do not all round to zero.
     """
-    for person in probabilities.keys():
-        s = probabilities[person]["gene"][0] + probabilities[person]["gene"][1] + probabilities[person]["gene"][2]
-        if s != 1 and s !=0 :
-            x = 1/s
-            for i in range(3):
-                probabilities[person]["gene"][i] *= x
-        m = probabilities[person]["trait"][True] + probabilities[person]["trait"][False]
-        if m != 1 and m != 0:
-            x = 1/m
-            probabilities[person]["trait"][True] *= x
-            probabilities[person]["trait"][False] *= x
+    for person in probabilities:
+        for field in ("gene", "trait"):
+            distribution = probabilities[person][field]
+            shift = max(distribution.values())
+            if shift == -math.inf:
+                raise ValueError(f"{person} has no possible {field} value")
+            total = sum(
+                math.exp(log_p - shift) for log_p in distribution.values()
+            )
+            for value in distribution:
+                distribution[value] = (
+                    math.exp(distribution[value] - shift) / total
+                )
 
 
+def log_add(a, b):
+    """
+    Return log(exp(a) + exp(b)) without leaving log space.
+    """
+    if a < b:
+        a, b = b, a
+    if b == -math.inf:
+        return a
+    return a + math.log1p(math.exp(b - a))
+
+
+METHODS = {
+    "exact": eliminate_probabilities,
+    "enumerate": enumerate_probabilities,
+    "vectorized": vectorized_probabilities,
+    "likelihood": lambda people, model: sample_probabilities(
+        people, model, "likelihood"
+    )[0],
+    "gibbs": lambda people, model: sample_probabilities(
+        people, model, "gibbs"
+    )[0]
+}
+
 
 if __name__ == "__main__":
     main()
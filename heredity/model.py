@@ -0,0 +1,76 @@
+import functools
+import json
+
+import numpy as np
+
+
+class Model():
+
+    def __init__(self, probs):
+        """
+        Compile a probability model given as a dictionary in the format of
+        `heredity.PROBS` into arrays indexed by gene count and trait value
+        (0 or 1), so that inference looks probabilities up by position.
+
+        Raise ValueError if a distribution does not sum to 1 or the
+        mutation probability is not between 0 and 1.
+        """
+        self.gene = np.array([probs["gene"][g] for g in range(3)], dtype=float)
+        self.trait = np.array([
+            [probs["trait"][g][False], probs["trait"][g][True]]
+            for g in range(3)
+        ], dtype=float)
+        self.mutation = float(probs["mutation"])
+        if not 0 <= self.mutation <= 1:
+            raise ValueError("mutation probability must be between 0 and 1")
+        for name, table in (("gene", self.gene), ("trait", self.trait)):
+            if (table < 0).any() or not np.allclose(table.sum(axis=-1), 1):
+                raise ValueError(f"{name} probabilities must sum to 1")
+        self.inheritance = inheritance_table(self.mutation)
+
+        # Logs of each table, as nested lists for lookups from Python loops
+        with np.errstate(divide="ignore"):
+            self.log_gene = np.log(self.gene).tolist()
+            self.log_trait = np.log(self.trait).tolist()
+            self.log_inheritance = np.log(self.inheritance).tolist()
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Load a model from a JSON file laid out like `heredity.PROBS`, with
+        gene counts as string keys and trait values as "true" and "false".
+        """
+        with open(filename) as f:
+            probs = json.load(f)
+        return cls({
+            "gene": {int(g): p for g, p in probs["gene"].items()},
+            "trait": {
+                int(g): {
+                    True: trait["true"],
+                    False: trait["false"]
+                }
+                for g, trait in probs["trait"].items()
+            },
+            "mutation": probs["mutation"]
+        })
+
+
+@functools.lru_cache(maxsize=None)
+def inheritance_table(mutation):
+    """
+    Return an array whose [m, f, c] entry is the probability that a child
+    has c copies of the gene given that their mother has m copies and
+    their father has f copies, where each parent's gene mutates with
+    probability `mutation` as it is passed on.
+
+    Tables are computed once per mutation rate and are read-only.
+    """
+    passes = np.array([mutation, 0.5, 1 - mutation])
+    mother = passes[:, np.newaxis]
+    father = passes[np.newaxis, :]
+    table = np.empty((3, 3, 3))
+    table[:, :, 0] = (1 - mother) * (1 - father)
+    table[:, :, 1] = mother * (1 - father) + (1 - mother) * father
+    table[:, :, 2] = mother * father
+    table.flags.writeable = False
+    return table
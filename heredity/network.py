@@ -0,0 +1,249 @@
+import numpy as np
+
+
+class JunctionTree():
+
+    def __init__(self, people, prior, trait, inheritance):
+        """
+        Compile a family into a junction tree over each person's number of
+        copies of the gene.
+
+        `people` is a dictionary as returned by `load_data`. `prior[g]` is
+        the probability that a person without listed parents has g copies
+        of the gene, `trait[g, t]` the probability of trait value t (0 or
+        1) given g copies, and `inheritance[m, f, c]` the probability of a
+        child having c copies given m copies in the mother and f in the
+        father.
+        """
+        self.people = people
+        self.trait = trait
+        self.traits = {person: people[person]["trait"] for person in people}
+
+        # Each person contributes one factor over their own gene count,
+        # conditioned on their parents' gene counts if they are known
+        factors = []
+        for person in people:
+            mother = people[person]["mother"]
+            father = people[person]["father"]
+            if mother is None:
+                factors.append(((person,), prior))
+            else:
+                factors.append(((mother, father, person), inheritance))
+
+        # Eliminate variables in min-fill order; the neighbors of each
+        # variable when it is eliminated form its clique
+        self.order = min_fill_order(people, [scope for scope, _ in factors])
+        position = {person: i for i, person in enumerate(self.order)}
+        neighbors = {person: set() for person in people}
+        for scope, _ in factors:
+            for person in scope:
+                neighbors[person].update(scope)
+                neighbors[person].discard(person)
+
+        self.cliques = dict()
+        self.parent = dict()
+        for person in self.order:
+            rest = sorted(neighbors[person], key=position.get)
+            self.cliques[person] = (person, *rest)
+            self.parent[person] = rest[0] if rest else None
+            for other in rest:
+                neighbors[other].update(rest)
+                neighbors[other].discard(other)
+                neighbors[other].discard(person)
+
+        self.children = {person: [] for person in people}
+        for person, parent in self.parent.items():
+            if parent is not None:
+                self.children[parent].append(person)
+
+        # Each factor belongs to the clique of its first eliminated person
+        self.factors = {person: [] for person in people}
+        for scope, table in factors:
+            first = min(scope, key=position.get)
+            self.factors[first].append((scope, table))
+
+        self.evidence = {
+            person: self.likelihood(self.traits[person]) for person in people
+        }
+        self.messages = dict()
+
+        # People shared by each pair of neighboring cliques
+        self.separators = dict()
+        for person, parent in self.parent.items():
+            if parent is not None:
+                separator = tuple(
+                    other for other in self.cliques[person]
+                    if other in self.cliques[parent]
+                )
+                self.separators[person, parent] = separator
+                self.separators[parent, person] = separator
+
+    def likelihood(self, trait):
+        """
+        Return the likelihood of an observed trait value (True, False or
+        None if unknown) for each number of copies of the gene.
+        """
+        if trait is None:
+            return np.ones(3)
+        return self.trait[:, int(trait)]
+
+    def potential(self, clique):
+        """
+        Return the factors of the clique named by `clique`, including the
+        evidence about that person's trait, as (scope, table) pairs.
+        """
+        return self.factors[clique] + [((clique,), self.evidence[clique])]
+
+    def neighbors(self, clique):
+        """
+        Return the cliques adjacent to the clique named by `clique` in the
+        tree.
+        """
+        if self.parent[clique] is None:
+            return self.children[clique]
+        return self.children[clique] + [self.parent[clique]]
+
+    def incoming(self, clique, exclude=None):
+        """
+        Return the messages sent to the clique named by `clique` by its
+        neighbors in the tree, except for the neighbor `exclude`.
+        """
+        return [
+            self.messages[neighbor, clique]
+            for neighbor in self.neighbors(clique)
+            if neighbor != exclude
+        ]
+
+    def send(self, source, target):
+        """
+        Compute and store the message from the clique `source` to its
+        neighbor `target`, over the people the two cliques share.
+        Raise ValueError if the evidence is impossible under the model.
+        """
+        separator = self.separators[source, target]
+        table = contract(
+            self.potential(source) + self.incoming(source, exclude=target),
+            separator
+        )
+        total = table.sum()
+        if total == 0:
+            raise ValueError("known traits are impossible under the model")
+        self.messages[source, target] = (separator, table / total)
+
+    def calibrate(self):
+        """
+        Pass messages up the tree in elimination order and back down, so
+        that every clique has received messages from all its neighbors.
+        """
+        for person in self.order:
+            if self.parent[person] is not None:
+                self.send(person, self.parent[person])
+        for person in reversed(self.order):
+            for child in self.children[person]:
+                self.send(person, child)
+
+    def observe(self, person, trait):
+        """
+        Set the known trait of `person` to `trait` (True, False or None to
+        forget it) in a calibrated tree, and recalibrate it.
+
+        Only the messages that depend on that person's clique, those
+        directed away from it, are recomputed, so each update sends one
+        message per edge of the tree rather than two.
+        """
+        self.traits[person] = trait
+        self.evidence[person] = self.likelihood(trait)
+        if not self.messages:
+            self.calibrate()
+            return
+
+        # Send messages outward from the changed clique, each clique
+        # passing them on once it has received the new one
+        frontier = [(person, None)]
+        while frontier:
+            clique, source = frontier.pop()
+            for neighbor in self.neighbors(clique):
+                if neighbor != source:
+                    self.send(clique, neighbor)
+                    frontier.append((neighbor, clique))
+
+    def marginal(self, person):
+        """
+        Return the probability distributions of `person`'s gene count and
+        trait, given the evidence, in the format used by `main`. Raise
+        ValueError if the evidence is impossible under the model.
+        """
+        gene = contract(
+            self.potential(person) + self.incoming(person), (person,)
+        )
+        if gene.sum() == 0:
+            raise ValueError("known traits are impossible under the model")
+        gene = gene / gene.sum()
+        observed = self.traits[person]
+        if observed is None:
+            trait = gene @ self.trait
+        else:
+            trait = np.array([not observed, observed], dtype=float)
+        return {
+            "gene": {g: float(gene[g]) for g in (2, 1, 0)},
+            "trait": {True: float(trait[1]), False: float(trait[0])}
+        }
+
+    def marginals(self):
+        """
+        Return the probability distributions of each person's gene count
+        and trait, given the evidence, in the format used by `main`.
+        """
+        return {person: self.marginal(person) for person in self.people}
+
+
+def min_fill_order(people, scopes):
+    """
+    Return an elimination order of `people` that greedily eliminates the
+    person whose removal adds the fewest new edges between their neighbors
+    in the graph connecting people who share one of the `scopes`, breaking
+    ties by fewest neighbors.
+    """
+    neighbors = {person: set() for person in people}
+    for scope in scopes:
+        for person in scope:
+            neighbors[person].update(scope)
+            neighbors[person].discard(person)
+
+    def fill(person):
+        adjacent = list(neighbors[person])
+        return sum(
+            1 for i, a in enumerate(adjacent) for b in adjacent[i + 1:]
+            if b not in neighbors[a]
+        )
+
+    order = []
+    remaining = set(people)
+    while remaining:
+        person = min(
+            sorted(remaining),
+            key=lambda p: (fill(p), len(neighbors[p]))
+        )
+        adjacent = neighbors[person]
+        for other in adjacent:
+            neighbors[other].update(adjacent)
+            neighbors[other].discard(other)
+            neighbors[other].discard(person)
+        remaining.remove(person)
+        order.append(person)
+    return order
+
+
+def contract(factors, scope):
+    """
+    Multiply the (scope, table) pairs in `factors` together and sum out
+    every person not in `scope`. Return a table over `scope`.
+    """
+    labels = dict()
+    operands = []
+    for factor_scope, table in factors:
+        operands.append(table)
+        operands.append([
+            labels.setdefault(person, len(labels)) for person in factor_scope
+        ])
+    return np.einsum(*operands, [labels[person] for person in scope])
@@ -0,0 +1,279 @@
+import time
+
+import numpy as np
+
+# Number of weighted samples drawn at once by likelihood weighting
+BATCH = 10000
+
+
+class Pedigree():
+
+    def __init__(self, people, order):
+        """
+        Index a family for sampling. `people` is a dictionary as returned
+        by `load_data`, and `order` lists its names with everyone's
+        parents before them; people are numbered by their place in `order`.
+        """
+        self.names = order
+        index = {person: i for i, person in enumerate(order)}
+        self.mothers = np.array([
+            index.get(people[person]["mother"], -1) for person in order
+        ])
+        self.fathers = np.array([
+            index.get(people[person]["father"], -1) for person in order
+        ])
+        self.observed = np.array([
+            people[person]["trait"] is not None for person in order
+        ])
+        self.traits = np.array([
+            bool(people[person]["trait"]) for person in order
+        ], dtype=int)
+
+        # Children of each person as mother and as father, along with
+        # each child's other parent
+        self.as_mother = [
+            (np.flatnonzero(self.mothers == i),
+             self.fathers[self.mothers == i])
+            for i in range(len(order))
+        ]
+        self.as_father = [
+            (np.flatnonzero(self.fathers == i),
+             self.mothers[self.fathers == i])
+            for i in range(len(order))
+        ]
+
+    def __len__(self):
+        return len(self.names)
+
+
+def likelihood_weighting(pedigree, prior, trait, inheritance, samples,
+                         time_budget=None, rng=None):
+    """
+    Estimate gene and trait marginals by likelihood weighting: draw gene
+    counts for everyone, parents first, from `prior` and `inheritance`,
+    and weight each sample by the probability of the known traits.
+
+    Stop after `samples` samples, or once `time_budget` seconds have
+    passed. Return arrays of gene marginals (people x 3), trait marginals
+    (people x 2) and the standard error of each. Raise ValueError if
+    every sample has zero weight, as happens when the known traits are
+    impossible under the model.
+    """
+    rng = np.random.default_rng(rng)
+    n = len(pedigree)
+    start = time.perf_counter()
+    with np.errstate(divide="ignore"):
+        log_trait = np.log(trait)
+
+    # Weighted sums of each person's gene indicators and trait probability
+    # (and of their squares, for the variance of the weighted average)
+    totals = np.zeros(2)
+    sums = np.zeros((3, 4 * n))
+    shift = -np.inf
+    drawn = 0
+    while drawn < samples:
+        size = min(BATCH, samples - drawn)
+        genes = np.empty((size, n), dtype=int)
+        log_weight = np.zeros(size)
+        for i in range(n):
+            if pedigree.mothers[i] < 0:
+                distribution = np.broadcast_to(prior, (size, 3))
+            else:
+                distribution = inheritance[
+                    genes[:, pedigree.mothers[i]],
+                    genes[:, pedigree.fathers[i]]
+                ]
+            genes[:, i] = draw(distribution, rng)
+            if pedigree.observed[i]:
+                log_weight += log_trait[genes[:, i], pedigree.traits[i]]
+
+        # Weights are kept relative to the largest log weight seen so far,
+        # rescaling earlier sums whenever a larger one appears
+        drawn += size
+        if log_weight.max() == -np.inf:
+            if out_of_time(start, time_budget):
+                break
+            continue
+        if log_weight.max() > shift:
+            scale = np.exp(shift - log_weight.max())
+            totals *= scale, scale ** 2
+            sums *= np.array([scale, scale ** 2, scale ** 2])[:, np.newaxis]
+            shift = log_weight.max()
+        weight = np.exp(log_weight - shift)
+
+        values = statistics(pedigree, genes, trait)
+        totals += weight.sum(), (weight ** 2).sum()
+        sums[0] += weight @ values
+        sums[1] += weight ** 2 @ values
+        sums[2] += weight ** 2 @ values ** 2
+        if out_of_time(start, time_budget):
+            break
+
+    if totals[0] == 0:
+        raise ValueError("no sample agrees with the known traits")
+    mean = sums[0] / totals[0]
+    variance = (
+        sums[2] - 2 * mean * sums[1] + mean ** 2 * totals[1]
+    ) / totals[0] ** 2
+    return marginals(pedigree, trait, mean, np.sqrt(np.maximum(variance, 0)))
+
+
+def gibbs_sampling(pedigree, prior, trait, inheritance, samples, chains,
+                   burn_in, time_budget=None, rng=None):
+    """
+    Estimate gene and trait marginals by running `chains` Gibbs samplers
+    in parallel, each repeatedly redrawing every person's gene count from
+    its distribution given everyone else's.
+
+    Each sweep's conditional distributions are averaged after `burn_in`
+    sweeps, until `samples` (sweeps times chains) have been taken or
+    `time_budget` seconds have passed; at least one sweep is always run.
+    If time runs out during burn-in, every sweep so far is averaged
+    instead. Return arrays of gene marginals (people x 3), trait
+    marginals (people x 2) and the standard error of each, estimated
+    from the spread of the chains' averages.
+
+    Raise ValueError if some person has no possible gene count given the
+    rest of a chain, as happens when the known traits are impossible
+    under the model.
+    """
+    if chains < 2:
+        raise ValueError("at least two chains are needed to estimate errors")
+    rng = np.random.default_rng(rng)
+    n = len(pedigree)
+    start = time.perf_counter()
+    with np.errstate(divide="ignore"):
+        log_prior = np.log(prior)
+        log_trait = np.log(trait)
+        log_inheritance = np.log(inheritance)
+
+    # Start every chain from a draw of the genes, parents first, that
+    # agrees with each person's own known trait
+    genes = np.empty((chains, n), dtype=int)
+    for i in range(n):
+        if pedigree.mothers[i] < 0:
+            distribution = np.broadcast_to(prior, (chains, 3))
+        else:
+            distribution = inheritance[
+                genes[:, pedigree.mothers[i]], genes[:, pedigree.fathers[i]]
+            ]
+        if pedigree.observed[i]:
+            distribution = distribution * trait[:, pedigree.traits[i]]
+        if (distribution.sum(axis=1) == 0).any():
+            raise ValueError("known traits are impossible under the model")
+        genes[:, i] = draw(distribution, rng)
+
+    # Sums of the conditional distributions after burn-in, and over every
+    # sweep in case time runs out before burn-in ends
+    sums = np.zeros((chains, n, 3))
+    totals = np.zeros((chains, n, 3))
+    sweeps = 0
+    while True:
+        for i in range(n):
+
+            # Log probability of each gene count given the parents, the
+            # person's known trait and the children
+            if pedigree.mothers[i] < 0:
+                log_p = np.broadcast_to(log_prior, (chains, 3)).copy()
+            else:
+                log_p = log_inheritance[
+                    genes[:, pedigree.mothers[i]],
+                    genes[:, pedigree.fathers[i]]
+                ]
+            if pedigree.observed[i]:
+                log_p += log_trait[:, pedigree.traits[i]]
+            children, fathers = pedigree.as_mother[i]
+            if len(children):
+                log_p += log_inheritance[
+                    :, genes[:, fathers], genes[:, children]
+                ].sum(axis=2).T
+            children, mothers = pedigree.as_father[i]
+            if len(children):
+                log_p += log_inheritance[
+                    genes[:, mothers], :, genes[:, children]
+                ].sum(axis=1)
+
+            if (log_p.max(axis=1) == -np.inf).any():
+                raise ValueError(
+                    "known traits are impossible under the model"
+                )
+            distribution = np.exp(log_p - log_p.max(axis=1, keepdims=True))
+            distribution /= distribution.sum(axis=1, keepdims=True)
+            genes[:, i] = draw(distribution, rng)
+            totals[:, i] += distribution
+            if sweeps >= burn_in:
+                sums[:, i] += distribution
+
+        sweeps += 1
+        if sweeps * chains >= samples + burn_in * chains:
+            break
+        if out_of_time(start, time_budget):
+            break
+
+    # Average each chain's conditional distributions, and estimate the
+    # error from how much the chains' averages vary
+    if sweeps > burn_in:
+        averages = sums / (sweeps - burn_in)
+    else:
+        averages = totals / sweeps
+    traits = np.where(
+        pedigree.observed, pedigree.traits, averages @ trait[:, 1]
+    )
+    values = np.concatenate(
+        [averages[:, :, g] for g in range(3)] + [traits], axis=1
+    )
+    error = values.std(axis=0, ddof=1) / np.sqrt(chains)
+    return marginals(pedigree, trait, values.mean(axis=0), error)
+
+
+def out_of_time(start, time_budget):
+    """
+    Return True if more than `time_budget` seconds (if not None) have
+    passed since the time `start`.
+    """
+    return (
+        time_budget is not None
+        and time.perf_counter() - start > time_budget
+    )
+
+
+def draw(distribution, rng):
+    """
+    Return one gene count drawn from each row of `distribution`, an array
+    of probabilities of 0, 1 and 2 copies that need not be normalized.
+    """
+    cumulative = np.cumsum(distribution, axis=1)
+    point = rng.random(len(cumulative)) * cumulative[:, -1]
+    return (point[:, np.newaxis] >= cumulative[:, :2]).sum(axis=1)
+
+
+def statistics(pedigree, genes, trait):
+    """
+    Return, for each sample of `genes`, each person's indicators of
+    having 0, 1 and 2 copies and their probability of showing the trait,
+    laid out as in `marginals`.
+    """
+    columns = [genes == g for g in range(3)]
+    columns.append(np.where(
+        pedigree.observed, pedigree.traits, trait[genes, 1]
+    ))
+    return np.concatenate(columns, axis=1).astype(float)
+
+
+def marginals(pedigree, trait, mean, error):
+    """
+    Split flat arrays of estimates and standard errors, laid out as each
+    person's probability of 0 copies, then of 1 copy, then of 2 copies,
+    then of the trait, into gene and trait arrays.
+    """
+    n = len(pedigree)
+    gene = mean[:3 * n].reshape(3, n).T
+    gene_error = error[:3 * n].reshape(3, n).T
+    has_trait = mean[3 * n:]
+    trait_error = error[3 * n:]
+    return (
+        gene,
+        np.column_stack([1 - has_trait, has_trait]),
+        gene_error,
+        np.column_stack([trait_error, trait_error])
+    )
@@ -0,0 +1,299 @@
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from graph import LinkGraph
+from pagerank import (
+    DAMPING, EXACT_LIMIT, crawl, crawl_graph, iterate_pagerank,
+    parallel_pagerank, sample_pagerank, solve_pagerank, update_pagerank
+)
+
+SCALES = [100, 1000, 10000, 100000]
+SIZES = [10 ** 6, 10 ** 7]
+UPDATE_SCALES = [20000, 200000]
+UPDATE_TOLERANCES = [1e-3, 1e-6, 1e-8]
+LINKS_PER_PAGE = 10
+SAMPLES_PER_PAGE = 100
+SURFER_BATCHES = 10
+SEQUENTIAL_LIMIT = 100
+HTML_LIMIT = 10000
+BENCHMARK_TOLERANCE = 1e-8
+REFERENCE_TOLERANCE = 1e-12
+POWER_LAW_EXPONENT = 2.1
+DANGLING_FRACTION = 0.5
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "parallel":
+        sizes = [int(arg) for arg in sys.argv[2:]] or SIZES
+        benchmark_parallel(sizes)
+    elif len(sys.argv) > 1 and sys.argv[1] == "update":
+        scales = [int(arg) for arg in sys.argv[2:]] or UPDATE_SCALES
+        benchmark_update(scales)
+    elif len(sys.argv) > 1 and sys.argv[1] != "suite":
+        sys.exit("Usage: python benchmark.py "
+                 "[suite | parallel [links ...] | update [pages ...]]")
+    else:
+        benchmark_suite(SCALES)
+
+
+def benchmark_suite(scales):
+    """
+    For each generator and each number of pages in `scales`, time crawling
+    the generated corpus and report every engine's time, iterations, peak
+    memory and L1 error against a tightly converged reference.
+    """
+    for name, generator in GENERATORS.items():
+        for pages in scales:
+            graph = generator(pages, pages * LINKS_PER_PAGE)
+            print(f"{name}: {len(graph)} pages, {len(graph.targets)} links")
+
+            if pages <= HTML_LIMIT:
+                with tempfile.TemporaryDirectory() as directory:
+                    write_corpus(graph, directory)
+                    for crawler in (crawl, crawl_graph):
+                        elapsed, _ = timed(crawler, directory)
+                        print(f"  {crawler.__name__}: {elapsed:.3f}s")
+
+            if pages <= EXACT_LIMIT:
+                reference = solve_pagerank(graph, DAMPING)
+            else:
+                reference = iterate_pagerank(
+                    graph, DAMPING, REFERENCE_TOLERANCE, method="power",
+                    norm="l1"
+                )
+            reference = np.array([reference[page] for page in graph.pages])
+            corpus = graph.to_corpus() if pages <= SEQUENTIAL_LIMIT else None
+
+            print(f"  {'engine':<24}{'time':>10}{'iterations':>12}"
+                  f"{'peak memory':>14}{'L1 error':>12}")
+            for engine, run in ENGINES.items():
+                if engine == "sample" and corpus is None:
+                    continue
+                if engine == "exact" and pages > EXACT_LIMIT:
+                    continue
+                changes = []
+                elapsed, ranks = timed(
+                    run, corpus if engine == "sample" else graph, changes
+                )
+                peak = peak_memory(
+                    run, corpus if engine == "sample" else graph, []
+                )
+                ranks = np.array([ranks[page] for page in graph.pages])
+                error = np.abs(ranks - reference).sum()
+                iterations = len(changes) if changes else "-"
+                print(f"  {engine:<24}{elapsed:>9.3f}s{iterations:>12}"
+                      f"{peak / 2 ** 20:>11.1f} MB{error:>12.2e}")
+
+
+def benchmark_parallel(sizes):
+    """
+    For random graphs with each number of links in `sizes`, compare
+    `iterate_pagerank` with `parallel_pagerank` on 1, 2, 4, ... processes
+    up to the number of cores.
+    """
+    counts = [1]
+    while counts[-1] * 2 <= os.cpu_count():
+        counts.append(counts[-1] * 2)
+
+    for links in sizes:
+        graph = random_graph(links // LINKS_PER_PAGE, links)
+        print(f"{len(graph)} pages, {len(graph.targets)} links")
+
+        baseline, _ = timed(iterate_pagerank, graph, DAMPING)
+        print(f"  iterate_pagerank: {baseline:.2f}s")
+
+        for processes in counts:
+            elapsed, _ = timed(parallel_pagerank, graph, DAMPING, processes)
+            print(f"  parallel_pagerank, {processes} processes: "
+                  f"{elapsed:.2f}s (speedup {baseline / elapsed:.2f}x)")
+
+
+def benchmark_update(scales):
+    """
+    For each generator and each number of pages in `scales`, add one link
+    from the highest-numbered page to page 0 and compare refreshing the
+    PageRank values with `update_pagerank`, starting from values converged
+    to each tolerance before the edit, against `iterate_pagerank` on the
+    edited graph, reporting times and L1 errors against a tightly
+    converged reference.
+    """
+    for name, generator in GENERATORS.items():
+        for pages in scales:
+            graph = generator(pages, pages * LINKS_PER_PAGE)
+            edit = [(graph.pages[-1], graph.pages[0])]
+            edited = graph.edit(added_links=edit)
+            print(f"{name}: {len(graph)} pages, {len(graph.targets)} links, "
+                  f"1 link added")
+
+            reference = iterate_pagerank(
+                edited, DAMPING, REFERENCE_TOLERANCE, method="power",
+                norm="l1"
+            )
+            reference = np.array([reference[page] for page in edited.pages])
+
+            print(f"  {'norm':<6}{'tolerance':>10}{'iterate':>10}"
+                  f"{'update':>10}{'speedup':>9}"
+                  f"{'iterate error':>15}{'update error':>14}")
+            for norm in ("max", "l1"):
+                for tolerance in UPDATE_TOLERANCES:
+                    ranks = iterate_pagerank(
+                        graph, DAMPING, tolerance, norm=norm
+                    )
+                    baseline, full = timed(lambda: iterate_pagerank(
+                        edited, DAMPING, tolerance, norm=norm
+                    ))
+                    elapsed, (_, updated) = timed(lambda: update_pagerank(
+                        graph, ranks, DAMPING, added_links=edit,
+                        tolerance=tolerance, norm=norm
+                    ))
+                    errors = [
+                        np.abs(np.array([
+                            result[page] for page in edited.pages
+                        ]) - reference).sum()
+                        for result in (full, updated)
+                    ]
+                    print(f"  {norm:<6}{tolerance:>10.0e}{baseline:>9.3f}s"
+                          f"{elapsed:>9.3f}s{baseline / elapsed:>8.2f}x"
+                          f"{errors[0]:>15.2e}{errors[1]:>14.2e}")
+
+
+def timed(function, *args):
+    """
+    Call `function` with `args`, and return the elapsed wall time in
+    seconds together with its result.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def peak_memory(function, *args):
+    """
+    Call `function` with `args`, and return the peak number of bytes it
+    allocated in this process (memory used by worker processes is not
+    included).
+    """
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def random_graph(pages, links, seed=0):
+    """
+    Return a `LinkGraph` with `pages` pages and about `links` links, each
+    from and to a page chosen uniformly at random.
+    """
+    rng = np.random.default_rng(seed)
+    sources = rng.integers(0, pages, links)
+    targets = rng.integers(0, pages, links)
+    return edges_to_graph(pages, sources, targets)
+
+
+def power_law_graph(pages, links, exponent=POWER_LAW_EXPONENT, seed=0):
+    """
+    Return a `LinkGraph` with `pages` pages and about `links` links whose
+    in-degrees and out-degrees both follow a power law with `exponent`,
+    as is typical of the web.
+    """
+    rng = np.random.default_rng(seed)
+    weights = np.arange(1, pages + 1) ** (-1 / (exponent - 1))
+    weights /= weights.sum()
+    sources = rng.permutation(pages)[rng.choice(pages, links, p=weights)]
+    targets = rng.choice(pages, links, p=weights)
+    return edges_to_graph(pages, sources, targets)
+
+
+def dangling_graph(pages, links, fraction=DANGLING_FRACTION, seed=0):
+    """
+    Return a `LinkGraph` with `pages` pages and about `links` links, where
+    a `fraction` of the pages have no links and the others link to pages
+    chosen uniformly at random.
+    """
+    rng = np.random.default_rng(seed)
+    linking = rng.permutation(pages)[:max(1, int(pages * (1 - fraction)))]
+    sources = rng.choice(linking, links)
+    targets = rng.integers(0, pages, links)
+    return edges_to_graph(pages, sources, targets)
+
+
+def edges_to_graph(pages, sources, targets):
+    """
+    Return a `LinkGraph` over pages named "0.html", "1.html", ... from
+    arrays of source and target page indices, dropping self-links and
+    duplicate links.
+    """
+    keep = sources != targets
+    edges = np.unique(sources[keep] * pages + targets[keep])
+    return LinkGraph.from_edges(
+        [f"{i}.html" for i in range(pages)],
+        (edges // pages).astype(np.int32),
+        (edges % pages).astype(np.int32)
+    )
+
+
+def write_corpus(graph, directory):
+    """
+    Write `graph` to `directory` as one HTML file per page, in the format
+    read by `crawl`.
+    """
+    for page, links in graph.to_corpus().items():
+        with open(os.path.join(directory, page), "w") as f:
+            f.write("<!DOCTYPE html>\n<html>\n<body>\n")
+            for link in sorted(links):
+                f.write(f'<a href="{link}">{link}</a>\n')
+            f.write("</body>\n</html>\n")
+
+
+def run_iteration(**options):
+    """
+    Return an engine that runs `iterate_pagerank` with `options`, recording
+    the change after each sweep.
+    """
+    def run(corpus, changes):
+        return iterate_pagerank(
+            corpus, DAMPING, BENCHMARK_TOLERANCE, norm="l1",
+            callback=lambda iteration, change: changes.append(change),
+            **options
+        )
+    return run
+
+
+GENERATORS = {
+    "random": random_graph,
+    "power-law": power_law_graph,
+    "dangling-heavy": dangling_graph
+}
+
+ENGINES = {
+    "sample": lambda corpus, changes: sample_pagerank(
+        corpus, DAMPING, len(corpus) * SAMPLES_PER_PAGE
+    ),
+    "sample (batched)": lambda corpus, changes: sample_pagerank(
+        corpus, DAMPING, len(corpus) * SAMPLES_PER_PAGE,
+        surfers=len(corpus) * SAMPLES_PER_PAGE // SURFER_BATCHES
+    ),
+    "exact": lambda corpus, changes: solve_pagerank(corpus, DAMPING),
+    "power": run_iteration(method="power"),
+    "power + quadratic": run_iteration(
+        method="power", extrapolation="quadratic"
+    ),
+    "gauss-seidel": run_iteration(method="gauss-seidel"),
+    "gauss-seidel + aitken": run_iteration(
+        method="gauss-seidel", extrapolation="aitken"
+    ),
+    "parallel": lambda corpus, changes: parallel_pagerank(
+        corpus, DAMPING, tolerance=BENCHMARK_TOLERANCE
+    )
+}
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import mmap
+import os
+import struct
+
+import numpy as np
+from scipy import sparse
+
+
+class LinkGraph():
+
+    # File layout: a header followed by 8-byte aligned arrays
+    MAGIC = b"LINKGRPH"
+    HEADER = struct.Struct("<8s5q")
+
+    def __init__(self, pages, offsets, targets, index=None):
+        """
+        Create a new link graph in compressed sparse row form.
+
+        `pages` is a list of page names; page `pages[i]` links to the pages
+        whose indices are `targets[offsets[i]:offsets[i + 1]]`. `index`,
+        if given, is a dictionary already mapping each page to its index.
+
+        Graphs produced by crawling also record, for each page, the
+        (mtime, size) `fingerprints` of its file and the links it makes to
+        names outside the corpus, in the same compressed form.
+        """
+        self.pages = pages
+        self.offsets = offsets
+        self.targets = targets
+        if index is None:
+            index = {page: i for i, page in enumerate(pages)}
+        self.index = index
+        self.fingerprints = np.zeros((len(pages), 2), dtype=np.int64)
+        self.external_offsets = np.zeros(len(pages) + 1, dtype=np.int64)
+        self.external_targets = np.zeros(0, dtype=np.int32)
+        self.external_names = []
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Compile a dictionary mapping each page to the set of pages it links
+        to (as returned by `crawl`) into a link graph.
+        """
+        pages = sorted(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        offsets = np.zeros(len(pages) + 1, dtype=np.int64)
+        targets = []
+        for i, page in enumerate(pages):
+            links = sorted(index[link] for link in corpus[page])
+            targets.extend(links)
+            offsets[i + 1] = offsets[i] + len(links)
+        return cls(pages, offsets, np.array(targets, dtype=np.int32))
+
+    @classmethod
+    def from_edges(cls, pages, sources, targets):
+        """
+        Create a link graph over the list `pages` from parallel arrays of
+        source and target page indices, one entry per link.
+        """
+        order = np.lexsort((targets, sources))
+        offsets = np.zeros(len(pages) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(sources, minlength=len(pages)), out=offsets[1:]
+        )
+        return cls(pages, offsets, targets[order].astype(np.int32))
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Load a link graph saved with `save`. The arrays are memory-mapped
+        from the file rather than copied.
+        Raise ValueError if the file is not a saved link graph.
+        """
+        with open(filename, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if buffer[:len(cls.MAGIC)] != cls.MAGIC:
+            raise ValueError(f"{filename} is not a link graph")
+        try:
+            _, pages, links, names, external, blob = cls.HEADER.unpack_from(
+                buffer
+            )
+        except struct.error:
+            raise ValueError(f"{filename} is truncated")
+        position = cls.HEADER.size
+
+        def read(dtype, count):
+            nonlocal position
+            array = np.frombuffer(buffer, dtype, count, position)
+            position += -(-array.nbytes // 8) * 8
+            return array
+
+        offsets = read(np.int64, pages + 1)
+        targets = read(np.int32, links)
+        fingerprints = read(np.int64, 2 * pages).reshape(-1, 2)
+        external_offsets = read(np.int64, pages + 1)
+        external_targets = read(np.int32, external)
+        name_offsets = read(np.int64, pages + names + 1)
+        text = bytes(read(np.uint8, blob))
+        table = [
+            text[name_offsets[i]:name_offsets[i + 1]]
+            for i in range(pages + names)
+        ]
+
+        graph = cls([os.fsdecode(name) for name in table[:pages]],
+                    offsets, targets)
+        graph.fingerprints = fingerprints
+        graph.external_offsets = external_offsets
+        graph.external_targets = external_targets
+        graph.external_names = table[pages:]
+        return graph
+
+    def save(self, filename):
+        """
+        Save the graph to `filename` in a binary format that `load` can
+        memory-map. The file is replaced atomically.
+        """
+        table = [os.fsencode(page) for page in self.pages]
+        table.extend(self.external_names)
+        name_offsets = np.zeros(len(table) + 1, dtype=np.int64)
+        np.cumsum([len(name) for name in table], out=name_offsets[1:])
+        text = b"".join(table)
+
+        header = self.HEADER.pack(
+            self.MAGIC, len(self.pages), len(self.targets),
+            len(self.external_names), len(self.external_targets), len(text)
+        )
+        arrays = [
+            np.asarray(self.offsets, dtype=np.int64),
+            np.asarray(self.targets, dtype=np.int32),
+            np.asarray(self.fingerprints, dtype=np.int64),
+            np.asarray(self.external_offsets, dtype=np.int64),
+            np.asarray(self.external_targets, dtype=np.int32),
+            name_offsets,
+            np.frombuffer(text, dtype=np.uint8)
+        ]
+        temporary = f"{filename}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(header)
+            for array in arrays:
+                f.write(array.tobytes())
+                f.write(bytes(-array.nbytes % 8))
+        os.replace(temporary, filename)
+
+    def external_links(self):
+        """
+        Return a list of (page index, names) pairs for the pages that link
+        to names outside the corpus.
+        """
+        return [
+            (i, [self.external_names[j] for j in self.external_targets[
+                self.external_offsets[i]:self.external_offsets[i + 1]
+            ]])
+            for i in np.flatnonzero(np.diff(self.external_offsets))
+        ]
+
+    def set_external_links(self, external):
+        """
+        Record links to names outside the corpus, given as a list of
+        (page index, names) pairs.
+        """
+        intern = dict()
+        counts = np.zeros(len(self.pages), dtype=np.int64)
+        links = dict()
+        for i, names in external:
+            links.setdefault(i, []).extend(
+                intern.setdefault(name, len(intern)) for name in names
+            )
+            counts[i] += len(names)
+        self.external_offsets = np.zeros(len(self.pages) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.external_offsets[1:])
+        self.external_targets = np.array(
+            [j for i in sorted(links) for j in links[i]], dtype=np.int32
+        )
+        self.external_names = list(intern)
+
+    def edit(self, added_pages=(), removed_pages=(), added_links=(),
+             removed_links=()):
+        """
+        Return a new link graph with pages and links added or removed.
+        Links are given as (source, target) pairs of page names; links
+        from or to removed pages are dropped, and new pages are appended
+        after the remaining pages in the order given.
+        """
+        removed = set(removed_pages)
+        kept = np.ones(len(self.pages), dtype=bool)
+        kept[[self.index[page] for page in removed if page in self.index]] = (
+            False
+        )
+        new = [
+            page for page in dict.fromkeys(added_pages)
+            if page not in self.index or page in removed
+        ]
+
+        # Keep the page list and index when only links change
+        if kept.all() and not new:
+            pages, index = self.pages, self.index
+        else:
+            pages = [
+                page for page, keep in zip(self.pages, kept.tolist()) if keep
+            ]
+            pages.extend(new)
+            index = {page: i for i, page in enumerate(pages)}
+        n = len(pages)
+
+        # Encode each link as a single integer; renumbering keeps the
+        # remaining pages in order, so the encoded links stay sorted
+        if kept.all():
+            links = self.sources().astype(np.int64) * n + self.targets
+        else:
+            renumber = np.cumsum(kept) - 1
+            renumber[~kept] = -1
+            sources = renumber[self.sources()]
+            targets = renumber[self.targets]
+            keep = (sources >= 0) & (targets >= 0)
+            links = sources[keep] * n + targets[keep]
+
+        def encode(pairs):
+            return np.unique(np.array([
+                index[source] * n + index[target]
+                for source, target in pairs
+                if source in index and target in index and source != target
+            ], dtype=np.int64))
+
+        def find(values):
+            position = np.searchsorted(links, values)
+            found = position < len(links)
+            found[found] = links[position[found]] == values[found]
+            return position, found
+
+        position, found = find(encode(removed_links))
+        links = np.delete(links, position[found])
+        added = encode(added_links)
+        position, found = find(added)
+        links = np.insert(links, position[~found], added[~found])
+
+        offsets = np.searchsorted(links, np.arange(n + 1) * n)
+        return type(self)(
+            pages, offsets, (links % n).astype(np.int32), index
+        )
+
+    def __len__(self):
+        return len(self.pages)
+
+    def out_degree(self):
+        """Return an array with the number of links on each page."""
+        return np.diff(self.offsets)
+
+    def dangling(self):
+        """Return a boolean mask of the pages that have no links."""
+        return self.out_degree() == 0
+
+    def sources(self):
+        """Return, for each entry of `targets`, the index of its page."""
+        return np.repeat(
+            np.arange(len(self.pages), dtype=np.int32), self.out_degree()
+        )
+
+    def transition_matrix(self):
+        """
+        Return the sparse column-stochastic link matrix M, where M[j, i] is
+        the probability of following a link from page i to page j.
+        Columns of dangling pages are left empty.
+        """
+        n = len(self.pages)
+        degree = self.out_degree()
+        sources = self.sources()
+        weights = 1 / degree[sources]
+        return sparse.csr_matrix(
+            (weights, (self.targets, sources)), shape=(n, n)
+        )
+
+    def link_matrix(self):
+        """
+        Return the sparse adjacency matrix A, where A[i, j] is 1 if page i
+        links to page j, built directly on the graph's arrays.
+        """
+        n = len(self.pages)
+        return sparse.csr_matrix(
+            (np.ones(len(self.targets)), self.targets, self.offsets),
+            shape=(n, n)
+        )
+
+    def ranks(self, vector):
+        """Return a dictionary mapping each page to its value in `vector`."""
+        return dict(zip(self.pages, vector.tolist()))
+
+    def to_corpus(self):
+        """Return the graph as a dictionary mapping pages to sets of links."""
+        return {
+            page: set(
+                self.pages[j]
+                for j in self.targets[self.offsets[i]:self.offsets[i + 1]]
+            )
+            for i, page in enumerate(self.pages)
+        }
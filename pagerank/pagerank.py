@@ -1,21 +1,44 @@
+import itertools
+import math
+import mmap
+import multiprocessing
 import os
 import random
 import re
 import sys
+from multiprocessing import shared_memory
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse import linalg
+
+from graph import LinkGraph
 
 DAMPING = 0.85
 SAMPLES = 10000
+SURFERS = 10000
+TOLERANCE = 0.001
+MAX_ITERATIONS = 1000
+CRAWL_CHUNK = 1024
+PUSH_LIMIT = 0.1
+SEED_BATCH = 16
+EXTRAPOLATION_PERIOD = 10
+EXACT_LIMIT = 1000
+
+LINK_PATTERN = re.compile(rb"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
 
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python pagerank.py corpus [cache]")
+    cache = sys.argv[2] if len(sys.argv) == 3 else None
+    graph = load_graph(sys.argv[1], cache)
+    corpus = graph.to_corpus()
     ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
+    ranks = iterate_pagerank(graph, DAMPING)
     print(f"PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
@@ -48,6 +71,204 @@ def crawl(directory):
     return pages
 
 
+def crawl_graph(directory, processes=None, chunksize=CRAWL_CHUNK):
+    """
+    Parse a directory of HTML pages like `crawl`, but return a `LinkGraph`.
+
+    Files are parsed in chunks of `chunksize` by a pool of `processes`
+    workers (all cores by default). Each worker scans memory-mapped file
+    contents for links and returns them as arrays of page indices, so no
+    file text or link strings are kept once a chunk is done.
+    """
+    pages = list_pages(directory)
+    sources, targets, _ = parse_pages(
+        directory, pages, range(len(pages)), processes, chunksize
+    )
+    return LinkGraph.from_edges(pages, sources, targets)
+
+
+def load_graph(directory, cache=None, processes=None, chunksize=CRAWL_CHUNK):
+    """
+    Return the `LinkGraph` of a directory of HTML pages, using the compiled
+    graph stored in the file `cache`, if given, to avoid parsing pages
+    again.
+
+    If no page file has changed since the cache was written, the cached
+    graph is returned as-is, memory-mapped from disk. Otherwise only new
+    and modified files are parsed, and the cache is rewritten; a cache
+    that cannot be written is skipped.
+    """
+    if cache is None:
+        return crawl_graph(directory, processes, chunksize)
+    pages = list_pages(directory)
+    fingerprints = np.array([
+        (stat.st_mtime_ns, stat.st_size)
+        for stat in (os.stat(os.path.join(directory, page)) for page in pages)
+    ], dtype=np.int64).reshape(-1, 2)
+
+    try:
+        cached = LinkGraph.load(cache)
+    except (OSError, ValueError):
+        cached = None
+    if (cached is not None and cached.pages == pages
+            and np.array_equal(cached.fingerprints, fingerprints)):
+        return cached
+
+    # Determine which pages must be parsed again
+    index = {page: i for i, page in enumerate(pages)}
+    if cached is None:
+        stale = range(len(pages))
+    else:
+        stale = [
+            i for i, page in enumerate(pages)
+            if page not in cached.index or not np.array_equal(
+                cached.fingerprints[cached.index[page]], fingerprints[i]
+            )
+        ]
+    sources, targets, external = parse_pages(
+        directory, pages, stale, processes, chunksize
+    )
+
+    # Carry over the links of unchanged pages, including links to pages
+    # that were previously missing from the corpus but have since appeared
+    if cached is not None:
+        renumber = np.array(
+            [index.get(page, -1) for page in cached.pages], dtype=np.int64
+        )
+        unchanged = np.zeros(len(cached.pages), dtype=bool)
+        unchanged[renumber >= 0] = True
+        unchanged[[cached.index[pages[i]] for i in stale
+                   if pages[i] in cached.index]] = False
+        old_sources = cached.sources()
+        keep = unchanged[old_sources]
+        removed = keep & (renumber[cached.targets] < 0)
+        keep &= ~removed
+        sources = np.concatenate([sources, renumber[old_sources[keep]]])
+        targets = np.concatenate([targets, renumber[cached.targets[keep]]])
+        for old, target in zip(old_sources[removed], cached.targets[removed]):
+            external.append(
+                (renumber[old], [os.fsencode(cached.pages[target])])
+            )
+
+        found_sources = []
+        found_targets = []
+        for old, names in cached.external_links():
+            if not unchanged[old]:
+                continue
+            missing = []
+            for name in names:
+                target = index.get(os.fsdecode(name))
+                if target is None:
+                    missing.append(name)
+                elif target != renumber[old]:
+                    found_sources.append(renumber[old])
+                    found_targets.append(target)
+            if missing:
+                external.append((renumber[old], missing))
+        sources = np.concatenate([sources, found_sources]).astype(np.int32)
+        targets = np.concatenate([targets, found_targets]).astype(np.int32)
+
+    graph = LinkGraph.from_edges(pages, sources, targets)
+    graph.fingerprints = fingerprints
+    graph.set_external_links(external)
+    try:
+        graph.save(cache)
+    except OSError:
+        pass
+    return graph
+
+
+def list_pages(directory):
+    """
+    Return a sorted list of the HTML pages in `directory`.
+    """
+    return sorted(
+        filename for filename in os.listdir(directory)
+        if filename.endswith(".html")
+    )
+
+
+def parse_pages(directory, pages, selected, processes=None,
+                chunksize=CRAWL_CHUNK):
+    """
+    Extract the links of the pages whose indices are in `selected`, where
+    `pages` is the sorted list of every page in `directory`.
+
+    Return arrays of source and target page indices, one entry per link
+    between corpus pages, and a list of (source, names) pairs giving the
+    links of each page to names that are not in the corpus.
+    """
+    selected = list(selected)
+    chunks = [
+        [(i, pages[i]) for i in selected[start:start + chunksize]]
+        for start in range(0, len(selected), chunksize)
+    ]
+    arguments = (directory, pages)
+
+    if processes == 1:
+        _init_crawl_worker(*arguments)
+        results = list(map(_crawl_chunk, chunks))
+    else:
+        with multiprocessing.Pool(
+            processes, initializer=_init_crawl_worker, initargs=arguments
+        ) as pool:
+            results = pool.map(_crawl_chunk, chunks)
+
+    sources = np.concatenate(
+        [np.zeros(0, dtype=np.int32)] + [result[0] for result in results]
+    )
+    targets = np.concatenate(
+        [np.zeros(0, dtype=np.int32)] + [result[1] for result in results]
+    )
+    external = [pair for result in results for pair in result[2]]
+    return sources, targets, external
+
+
+def _init_crawl_worker(directory, pages):
+    """
+    Set up a crawl worker with the corpus directory and a table interning
+    every page name to its index.
+    """
+    global _crawl_directory, _crawl_index
+    _crawl_directory = directory
+    _crawl_index = {os.fsencode(page): i for i, page in enumerate(pages)}
+
+
+def _crawl_chunk(chunk):
+    """
+    Extract the links from a chunk of files, given as a list of
+    (page index, file name) pairs.
+    Return arrays of source and target page indices for links between
+    corpus pages, and a list of (source, names) pairs for other links.
+    """
+    sources = []
+    targets = []
+    external = []
+    for source, filename in chunk:
+        links = set()
+        missing = set()
+        with open(os.path.join(_crawl_directory, filename), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                continue
+            contents = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            with contents:
+                for match in LINK_PATTERN.finditer(contents):
+                    target = _crawl_index.get(match.group(1))
+                    if target is None:
+                        missing.add(match.group(1))
+                    elif target != source:
+                        links.add(target)
+        sources.extend([source] * len(links))
+        targets.extend(sorted(links))
+        if missing:
+            external.append((source, sorted(missing)))
+    return (
+        np.array(sources, dtype=np.int32),
+        np.array(targets, dtype=np.int32),
+        external
+    )
+
+
 def transition_model(corpus, page, damping_factor):
     """
     Return a probability distribution over which page to visit next,
@@ -77,7 +298,7 @@ def transition_model(corpus, page, damping_factor):
     
 
 
-def sample_pagerank(corpus, damping_factor, n):
+def sample_pagerank(corpus, damping_factor, n, surfers=None, seed=None):
     """
     Return PageRank values for each page by sampling `n` pages
     according to transition model, starting with a page at random.
@@ -85,7 +306,14 @@ def sample_pagerank(corpus, damping_factor, n):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    If `surfers` is given, the `n` samples are instead the pages visited
+    by independent random surfers, advanced `surfers` at a time with
+    NumPy (see `batch_sample_pagerank`).
     """
+    if surfers is not None:
+        return batch_sample_pagerank(corpus, damping_factor, n, surfers, seed)
+
     ans = list()
     sampleDict = dict()
     pages = list(corpus.keys())
@@ -119,29 +347,59 @@ def sample_pagerank(corpus, damping_factor, n):
         sampleDict[page] = tempDict[page]/n
     return sampleDict
                 
-        
-def it(corpus,network ,damping_factor, rank):
-        f = False
-        t = dict()
-        n = len(corpus.keys())
-        for page in corpus.keys():
-            sum = 0
-            for p in network[page]:
-                
-                sum+= rank[p]/len(corpus[p])
-            a = (1-damping_factor)/n + damping_factor*sum
-            t[page] = a
-        for page in t.keys():
-            if abs(rank[page] - t[page]) > 0.001:
-                rank[page] = t[page]
-                f = True
-        if f:
-            return it(corpus,network,damping_factor, rank)
-        else:
-           
-            return rank
 
-def iterate_pagerank(corpus, damping_factor):
+
+def batch_sample_pagerank(corpus, damping_factor, n, surfers=SURFERS,
+                          seed=None):
+    """
+    Return PageRank values for each page from about `n` pages visited by
+    random surfers, up to `surfers` of which are advanced together.
+
+    Each surfer starts at a page chosen at random and, at every step,
+    stops with probability 1 - `damping_factor`; otherwise it follows
+    one of the current page's links chosen uniformly (or, if the page has
+    no links, jumps to a page chosen uniformly from the whole corpus).
+    The expected number of visits a surfer pays to each page is its
+    PageRank divided by 1 - `damping_factor`, so counting every page
+    visited, start included, and dividing by the total needs no burn-in,
+    however short each walk.
+    """
+    graph = compile_graph(corpus)
+    pages = len(graph)
+    degree = graph.out_degree()
+    rng = np.random.default_rng(seed)
+    counts = np.zeros(pages, dtype=np.int64)
+
+    # Each surfer visits 1 / (1 - d) pages on average, so start only as
+    # many as are expected to make up the remaining visits
+    visits = 0
+    while visits < n:
+        walks = math.ceil((n - visits) * (1 - damping_factor))
+        position = rng.integers(0, pages, max(1, min(surfers, walks)))
+        while len(position):
+
+            # Record every surfer's current page, and keep those that go on
+            counts += np.bincount(position, minlength=pages)
+            visits += len(position)
+            position = position[rng.random(len(position)) < damping_factor]
+
+            # Advance every remaining surfer by one step
+            links = degree[position]
+            follow = links > 0
+            choice = (rng.random(len(position)) * links).astype(np.int64)
+            new = rng.integers(0, pages, len(position))
+            new[follow] = graph.targets[
+                graph.offsets[position[follow]] + choice[follow]
+            ]
+            position = new
+
+    return graph.ranks(counts / visits)
+
+
+def iterate_pagerank(corpus, damping_factor, tolerance=TOLERANCE,
+                     max_iterations=MAX_ITERATIONS, method="auto",
+                     extrapolation=None, period=EXTRAPOLATION_PERIOD,
+                     norm="max", callback=None):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
@@ -149,25 +407,402 @@ def iterate_pagerank(corpus, damping_factor):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    `method` selects the update: "power" computes every new value from
+    the previous sweep's values (Jacobi), while "gauss-seidel" uses each
+    new value as soon as it is computed within a sweep. "exact" skips
+    iteration and solves for the values directly (see `solve_pagerank`).
+    "auto" does so for corpora of at most `EXACT_LIMIT` pages when no
+    option below is changed from its default, and otherwise uses "power".
+    If `extrapolation` is "aitken" or "quadratic", every `period` sweeps
+    the values are extrapolated from the last few sweeps to jump towards
+    the limit.
+
+    Iteration stops once the change between sweeps is at most `tolerance`,
+    measured as the largest change in any value (`norm="max"`) or the sum
+    of all changes (`norm="l1"`), or after `max_iterations` sweeps. If
+    given, `callback(iteration, change)` is called after every sweep.
     """
-    network = dict()
-    for page in corpus.keys():
-        num = set()
-        for p in corpus.keys():
-            if page == p:
-                continue
-            for i in corpus[p]:
-                if i == page:
-                    num.add(p)    
-        network[page] = num
- 
-    iterativeRank = dict()
-    for page in network.keys():
-        iterativeRank[page] = 1/len(network.keys())
-
-    iterativeRank = it(corpus,network, damping_factor, iterativeRank)
-
-    return iterativeRank
+    if method not in ("auto", "exact", "power", "gauss-seidel"):
+        raise ValueError(f"unknown method {method!r}")
+    if extrapolation not in (None, "aitken", "quadratic"):
+        raise ValueError(f"unknown extrapolation {extrapolation!r}")
+    if norm not in ("max", "l1"):
+        raise ValueError(f"unknown norm {norm!r}")
+
+    graph = compile_graph(corpus)
+    n = len(graph)
+
+    # The exact solver takes none of the options that control iteration
+    iterative = (
+        tolerance != TOLERANCE or max_iterations != MAX_ITERATIONS
+        or extrapolation is not None or period != EXTRAPOLATION_PERIOD
+        or norm != "max" or callback is not None
+    )
+    if method == "auto":
+        exact = n <= EXACT_LIMIT and not iterative
+        method = "exact" if exact else "power"
+    if method == "exact":
+        if iterative:
+            raise ValueError("the exact method takes no iteration options")
+        return solve_pagerank(graph, damping_factor)
+    matrix = graph.transition_matrix()
+    dangling = graph.dangling()
+
+    # Gauss-Seidel solves for links from earlier pages in place; links
+    # from later pages and pages with no links use the previous sweep
+    if method == "gauss-seidel":
+        lower = (
+            sparse.identity(n, format="csr")
+            - damping_factor * sparse.tril(matrix, format="csr")
+        ).tocsr()
+        upper = sparse.triu(matrix, k=1, format="csr")
+
+    rank = np.full(n, 1 / n)
+    history = []
+    for iteration in range(1, max_iterations + 1):
+
+        # Pages with no links are treated as linking to every page
+        base = (1 - damping_factor) / n + damping_factor * (
+            rank[dangling].sum() / n
+        )
+        if method == "power":
+            new = base + damping_factor * (matrix @ rank)
+        else:
+            new = linalg.spsolve_triangular(
+                lower, base + damping_factor * (upper @ rank), lower=True
+            )
+            new /= new.sum()
+
+        if extrapolation is not None:
+            history = (history + [new])[-4:]
+            if iteration % period == 0:
+                new = extrapolate(history, extrapolation)
+
+        difference = np.abs(new - rank)
+        change = difference.max() if norm == "max" else difference.sum()
+        rank = new
+        if callback is not None:
+            callback(iteration, change)
+        if change <= tolerance:
+            break
+
+    return graph.ranks(rank)
+
+
+def solve_pagerank(corpus, damping_factor):
+    """
+    Return exact PageRank values for each page by solving for the
+    stationary distribution of the transition model directly.
+
+    The PageRank vector r satisfies r = (1 - d) / N + d * M r, where column
+    i of the dense matrix M is the distribution of the page after page i
+    when following a link (uniform over every page if page i has no
+    links). This solves (I - d * M) r = (1 - d) / N with LAPACK, which
+    takes O(N^3) time and O(N^2) memory, so suits small corpora.
+    """
+    graph = compile_graph(corpus)
+    n = len(graph)
+    matrix = graph.transition_matrix().toarray()
+    matrix[:, graph.dangling()] = 1 / n
+
+    system = np.identity(n) - damping_factor * matrix
+    rank = np.linalg.solve(system, np.full(n, (1 - damping_factor) / n))
+    return graph.ranks(rank / rank.sum())
+
+
+def extrapolate(history, kind):
+    """
+    Return an estimate of the limit of the sequence of PageRank vectors in
+    `history` (oldest first), using componentwise Aitken extrapolation
+    ("aitken") or quadratic extrapolation ("quadratic").
+    If there are too few vectors, return the last one unchanged.
+    """
+    if kind == "aitken" and len(history) >= 3:
+        x0, x1, x2 = history[-3:]
+        denominator = x2 - 2 * x1 + x0
+        safe = np.abs(denominator) > 1e-15
+        estimate = x2.copy()
+        estimate[safe] = x0[safe] - (x1 - x0)[safe] ** 2 / denominator[safe]
+    elif kind == "quadratic" and len(history) >= 4:
+        x0, x1, x2, x3 = history[-4:]
+        y = np.column_stack([x1 - x0, x2 - x0])
+        gamma = np.linalg.lstsq(y, -(x3 - x0), rcond=None)[0]
+        g1, g2, g3 = gamma[0], gamma[1], 1
+        estimate = (g1 + g2 + g3) * x1 + (g2 + g3) * x2 + g3 * x3
+    else:
+        return history[-1]
+
+    # Extrapolation can overshoot, so keep values positive and summing to 1
+    estimate = np.maximum(estimate, 0)
+    return estimate / estimate.sum()
+
+
+def personalized_pagerank(corpus, damping_factor, seeds, tolerance=TOLERANCE,
+                          max_iterations=MAX_ITERATIONS, batch=SEED_BATCH):
+    """
+    Return personalized PageRank values for every seed in `seeds`, a
+    dictionary mapping keys to either a collection of pages or, for
+    topic-sensitive ranks, a dictionary mapping pages to weights.
+
+    With probability `1 - damping_factor`, and whenever it reaches a page
+    with no links, the surfer jumps to a page of the seed chosen in
+    proportion to its weight instead of to any page in the corpus.
+
+    Return a 2-D array with one row per key of `seeds` (in order) and one
+    column per page of `compile_graph(corpus).pages`. Seeds are iterated
+    together in groups of `batch`, so each sweep reads the links once per
+    group rather than once per seed.
+    """
+    graph = compile_graph(corpus)
+    n = len(graph)
+    matrix = graph.transition_matrix()
+    dangling = np.flatnonzero(graph.dangling())
+
+    # Build the teleport distribution of each seed as a column
+    teleport = np.zeros((n, len(seeds)))
+    for column, seed in enumerate(seeds.values()):
+        if not isinstance(seed, dict):
+            seed = dict.fromkeys(seed, 1)
+        for page, weight in seed.items():
+            teleport[graph.index[page], column] = weight
+    totals = teleport.sum(axis=0)
+    for key, total in zip(seeds, totals):
+        if total <= 0:
+            raise ValueError(f"seed {key!r} has no weight")
+    teleport /= totals
+
+    ranks = np.empty((len(seeds), n))
+    for start in range(0, len(seeds), batch):
+        block = teleport[:, start:start + batch]
+        rank = np.array(block, order="C")
+        rows, columns = np.nonzero(block)
+        values = block[rows, columns]
+        for _ in range(max_iterations):
+
+            # Teleports and pages with no links both lead back to the seed
+            weight = (1 - damping_factor) + damping_factor * (
+                rank[dangling].sum(axis=0)
+            )
+            new = matrix @ rank
+            new *= damping_factor
+            new[rows, columns] += values * weight[columns]
+
+            # Reuse the old ranks' memory to measure the change
+            np.subtract(new, rank, out=rank)
+            np.abs(rank, out=rank)
+            change = rank.max()
+            rank = new
+            if change <= tolerance:
+                break
+        ranks[start:start + batch] = rank.T
+
+    return ranks
+
+
+def parallel_pagerank(corpus, damping_factor, processes=None,
+                      tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS):
+    """
+    Return PageRank values for each page like `iterate_pagerank`, but
+    spread each sweep over `processes` worker processes (all cores by
+    default).
+
+    The pages are split into blocks with roughly equal numbers of incoming
+    links. The link matrix and the PageRank values live in shared memory,
+    and each worker computes the new values of one block per sweep.
+    """
+    graph = compile_graph(corpus)
+    n = len(graph)
+    matrix = graph.transition_matrix()
+    dangling = np.flatnonzero(graph.dangling())
+    processes = processes or os.cpu_count()
+
+    # Split destination pages into blocks of similar work
+    bounds = np.searchsorted(
+        matrix.indptr, np.linspace(0, matrix.nnz, processes + 1)
+    )
+    bounds[0], bounds[-1] = 0, n
+    blocks = [
+        (start, end) for start, end in zip(bounds[:-1], bounds[1:])
+        if start < end
+    ]
+
+    # Alternate between two rows of PageRank values across sweeps
+    rank = np.full((2, n), 1 / n)
+    arrays = (matrix.indptr, matrix.indices, matrix.data, rank)
+    memory = [shared_memory.SharedMemory(create=True, size=max(1, a.nbytes))
+              for a in arrays]
+    try:
+        specs = []
+        for array, block in zip(arrays, memory):
+            view = np.ndarray(array.shape, array.dtype, buffer=block.buf)
+            view[...] = array
+            specs.append((block.name, array.shape, array.dtype.str))
+        rank = np.ndarray((2, n), np.float64, buffer=memory[-1].buf)
+
+        with multiprocessing.Pool(
+            len(blocks), initializer=_init_rank_worker, initargs=(specs,)
+        ) as pool:
+            current = 0
+            for _ in range(max_iterations):
+                base = (1 - damping_factor) / n + damping_factor * (
+                    rank[current, dangling].sum() / n
+                )
+                changes = pool.map(_rank_block, [
+                    (start, end, current, base, damping_factor)
+                    for start, end in blocks
+                ])
+                current = 1 - current
+                if max(changes) <= tolerance:
+                    break
+        result = graph.ranks(rank[current])
+        del rank, view
+    finally:
+        for block in memory:
+            block.close()
+            block.unlink()
+
+    return result
+
+
+def _init_rank_worker(specs):
+    """
+    Set up a PageRank worker by attaching to the shared link matrix and
+    PageRank values, given as (name, shape, dtype) of each shared block.
+    """
+    global _rank_memory, _rank_arrays, _rank_blocks
+    _rank_memory = [shared_memory.SharedMemory(name) for name, _, _ in specs]
+    _rank_arrays = [
+        np.ndarray(shape, dtype, buffer=block.buf)
+        for block, (_, shape, dtype) in zip(_rank_memory, specs)
+    ]
+    _rank_blocks = dict()
+
+
+def _rank_block(task):
+    """
+    Compute the new PageRank values of the pages in one block, given as
+    (start, end, current row, base value, damping factor).
+    Return the largest change in any of the block's values.
+    """
+    start, end, current, base, damping_factor = task
+    indptr, indices, data, rank = _rank_arrays
+
+    # Each worker slices its rows of the link matrix once
+    if (start, end) not in _rank_blocks:
+        first, last = indptr[start], indptr[end]
+        _rank_blocks[start, end] = sparse.csr_matrix(
+            (data[first:last], indices[first:last],
+             indptr[start:end + 1] - first),
+            shape=(end - start, rank.shape[1])
+        )
+    block = _rank_blocks[start, end]
+
+    new = base + damping_factor * (block @ rank[current])
+    change = np.abs(new - rank[current, start:end]).max()
+    rank[1 - current, start:end] = new
+    return change
+
+
+def update_pagerank(corpus, ranks, damping_factor, added_pages=(),
+                    removed_pages=(), added_links=(), removed_links=(),
+                    tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS,
+                    norm="max"):
+    """
+    Update the PageRank values `ranks` of `corpus` after an edit to the
+    corpus, given as pages and (source, target) links that were added or
+    removed. Return the edited corpus as a `LinkGraph` and a dictionary of
+    its PageRank values.
+
+    Iteration starts from the previous values, and each round pushes the
+    residual of every page where it is large along that page's links at
+    once (Gauss-Southwell style), updating the residual only where the
+    pushed mass lands. After a small edit only pages near the change are
+    touched; when much of the corpus needs updating a full power sweep is
+    done instead. Iteration stops once the residual, which is the change
+    a further power sweep would make, is at most `tolerance` in the norm
+    `norm` ("max" or "l1", as for `iterate_pagerank`), or after
+    `max_iterations` rounds.
+    """
+    if norm not in ("max", "l1"):
+        raise ValueError(f"unknown norm {norm!r}")
+    previous = compile_graph(corpus)
+    graph = previous.edit(
+        added_pages, removed_pages, added_links, removed_links
+    )
+    n = len(graph)
+    inbound = graph.link_matrix().T
+    degree = graph.out_degree()
+    dangling = degree == 0
+
+    # Warm start from the previous values, giving new pages an average
+    # share; values already listed in page order need no lookups by name
+    if graph.pages is previous.pages and list(ranks) == graph.pages:
+        rank = np.fromiter(ranks.values(), float, n)
+    else:
+        rank = np.fromiter(
+            map(ranks.get, graph.pages, itertools.repeat(1 / n)), float, n
+        )
+    rank /= rank.sum()
+
+    # Residuals are recomputed in full only after a full sweep, or once
+    # the mass pushed from pages without links, owed to every page alike
+    # and kept apart in `spread`, grows large; in between, every page
+    # outside `candidates` has a residual within `threshold`
+    threshold = tolerance / 2 if norm == "max" else tolerance / (2 * n)
+    scale = 1 / np.maximum(degree, 1)
+    residual = None
+    for _ in range(max_iterations):
+        if residual is None or abs(spread) > threshold:
+            residual = (1 - damping_factor) / n + damping_factor * (
+                inbound @ (rank * scale) + rank[dangling].sum() / n
+            ) - rank
+            spread = 0
+            size = np.abs(residual)
+            if (size.max() if norm == "max" else size.sum()) <= tolerance:
+                break
+            active = np.flatnonzero(size > threshold)
+        else:
+            active = candidates[np.abs(residual[candidates]) > threshold]
+            if len(active) == 0:
+                break
+        if len(active) > PUSH_LIMIT * n:
+            rank += residual + spread
+            residual = None
+            continue
+
+        # Push every active page's residual along its links together
+        mass = residual[active]
+        rank[active] += mass
+        residual[active] = 0
+        linking = degree[active] > 0
+        spread += damping_factor * mass[~linking].sum() / n
+        pushing = active[linking]
+        counts = degree[pushing]
+        first = np.cumsum(counts) - counts
+        links = graph.targets[
+            np.repeat(graph.offsets[pushing] - first, counts)
+            + np.arange(counts.sum())
+        ]
+        np.add.at(
+            residual, links,
+            np.repeat(damping_factor * mass[linking] / counts, counts)
+        )
+        links.sort()
+        candidates = links[np.diff(links, prepend=-1) > 0]
+
+    return graph, graph.ranks(rank / rank.sum())
+
+
+def compile_graph(corpus):
+    """
+    Return `corpus` as a `LinkGraph`, compiling it if it is a dictionary
+    as returned by `crawl`.
+    """
+    if isinstance(corpus, LinkGraph):
+        return corpus
+    return LinkGraph.from_corpus(corpus)
+
 
 if __name__ == "__main__":
     main()